@@ -0,0 +1,33 @@
+import pytest
+
+from benchmarks.records import generate_records
+
+DEFAULT_RECORD_COUNTS = "1000,10000,100000"
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--record-counts",
+        default=DEFAULT_RECORD_COUNTS,
+        help="comma separated catalogue sizes to benchmark",
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "record_count" in metafunc.fixturenames:
+        counts = metafunc.config.getoption("record_counts").split(",")
+        metafunc.parametrize(
+            "record_count", [int(count) for count in counts], scope="module"
+        )
+
+
+@pytest.fixture(scope="module")
+def records(record_count):
+    return list(generate_records(record_count))
+
+
+def run_rounds(benchmark, function, record_count):
+    """Repeat small catalogues a few times, run the big ones once"""
+    return benchmark.pedantic(
+        function, rounds=max(1, 10_000 // record_count), iterations=1
+    )
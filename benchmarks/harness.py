@@ -0,0 +1,328 @@
+"""
+Offline end-to-end harness: runs harvest and delivery of the whole pipeline against local
+stand-ins of the ORL OAI-PMH endpoint, the ORL file host and S3 (moto).
+Run: python -m benchmarks.harness --records 500 --latency 0.05 --bandwidth 2000000 --error-rate 0.01
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+import boto3
+
+try:
+    from moto import mock_aws
+except ImportError:  # moto < 5, the last releases for python 3.7
+    from moto import mock_s3 as mock_aws
+
+from benchmarks.records import generate_records
+from src import main
+from src.contants import ORL_BASE_URL
+from src.pipeline import PipelineStats
+from src.uploader import S3Uploader
+
+OAI_PAGE_SIZE = 100
+BUCKET = "harness-bucket"
+
+OAI_PAGE = """<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">
+  <responseDate>2021-01-01T00:00:00Z</responseDate>
+  <request verb="ListRecords">{endpoint}</request>
+  <ListRecords>
+{records}
+    <resumptionToken completeListSize="{total}">{token}</resumptionToken>
+  </ListRecords>
+</OAI-PMH>"""
+OAI_RECORD = """    <record>
+      <header><identifier>oai:harness:{number}</identifier><datestamp>2021-01-01</datestamp></header>
+      <metadata>
+        <oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/"
+                   xmlns:dc="http://purl.org/dc/elements/1.1/">
+{elements}
+        </oai_dc:dc>
+      </metadata>
+    </record>"""
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status: int, body: bytes, headers: dict = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LocalServer(ThreadingHTTPServer):
+    """Threaded HTTP server on a free local port, started in a background thread"""
+
+    daemon_threads = True
+
+    def __init__(self, handler):
+        super().__init__(("127.0.0.1", 0), handler)
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class OaiRequestHandler(_QuietHandler):
+    def do_GET(self):  # pylint: disable=invalid-name
+        params = {
+            key: values[0]
+            for key, values in parse_qs(urlparse(self.path).query).items()
+        }
+        page = int(params.get("resumptionToken", "page-0").split("-")[1])
+        self.send_body(200, self.server.render_page(page), {"Content-Type": "text/xml"})
+
+
+class OaiServer(LocalServer):
+    """
+    OAI-PMH ListRecords endpoint serving records in pages of page_size linked by resumption tokens
+    Args:
+        records: oai_dc records, see benchmarks.records.generate_records
+        page_size: number of records per page
+    """
+
+    def __init__(self, records: List[dict], page_size: int = OAI_PAGE_SIZE):
+        super().__init__(OaiRequestHandler)
+        self.records = records
+        self.page_size = page_size
+        self.pages_served = 0
+
+    @property
+    def endpoint(self) -> str:
+        return f"{self.base_url}/oai"
+
+    def render_page(self, page: int) -> bytes:
+        start = page * self.page_size
+        records = self.records[start : start + self.page_size]
+        has_next = start + self.page_size < len(self.records)
+        rendered = []
+        for number, record in enumerate(records, start):
+            elements = "\n".join(
+                f"          <dc:{field}>{escape(value)}</dc:{field}>"
+                for field, values in record.items()
+                for value in values
+            )
+            rendered.append(OAI_RECORD.format(number=number, elements=elements))
+        self.pages_served += 1
+        return OAI_PAGE.format(
+            endpoint=self.endpoint,
+            records="\n".join(rendered),
+            total=len(self.records),
+            token=f"page-{page + 1}" if has_next else "",
+        ).encode("utf-8")
+
+
+class FileRequestHandler(_QuietHandler):
+    def do_GET(self):  # pylint: disable=invalid-name
+        server = self.server
+        time.sleep(server.latency)
+        if server.rng_random() < server.error_rate:
+            self.send_body(503, b"service unavailable")
+            return
+        path = urlparse(self.path).path
+        size = server.cover_size if path.endswith(".jpg") else server.book_size
+        body = hashlib.sha256(path.encode()).digest() * (size // 32 + 1)
+        body = body[:size]
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_body(304, b"", {"ETag": etag})
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        chunk_size = 64 * 1024
+        for offset in range(0, len(body), chunk_size):
+            chunk = body[offset : offset + chunk_size]
+            if server.bandwidth:
+                time.sleep(len(chunk) / server.bandwidth)
+            self.wfile.write(chunk)
+
+
+class FileServer(LocalServer):
+    """
+    Stand-in of the ORL file host serving deterministic book and cover bodies for any
+    /ext/api/media/<id>/assets/... path
+    Args:
+        latency: delay before every response, in seconds
+        bandwidth: max bytes per second of every response, unlimited if 0
+        error_rate: share of requests answered with HTTP 503
+        book_size: size of every book file, in bytes
+        cover_size: size of every cover, in bytes
+        seed: random seed of errors
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        bandwidth: int = 0,
+        error_rate: float = 0.0,
+        book_size: int = 200_000,
+        cover_size: int = 20_000,
+        seed: int = 0,
+    ):
+        super().__init__(FileRequestHandler)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.book_size = book_size
+        self.cover_size = cover_size
+        rng = random.Random(seed)
+        lock = threading.Lock()
+
+        def rng_random() -> float:
+            with lock:
+                return rng.random()
+
+        self.rng_random = rng_random
+
+
+def point_to_host(records: List[dict], base_url: str) -> List[dict]:
+    """Rewrite ORL viewer and download links of records to the local file server"""
+    for record in records:
+        record["identifier"] = [
+            identifier.replace(ORL_BASE_URL, base_url)
+            for identifier in record["identifier"]
+        ]
+    return records
+
+
+@contextmanager
+def s3_uploader(bucket_name: str = BUCKET):
+    """moto S3 backend with an empty bucket"""
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=bucket_name)
+        yield S3Uploader(bucket_name=bucket_name, prefix="orl", client=client)
+
+
+def run_pipeline(
+    record_count: int = 100,
+    workers: int = 8,
+    latency: float = 0.0,
+    bandwidth: int = 0,
+    error_rate: float = 0.0,
+    work_dir: str = None,
+    seed: int = 0,
+    page_size: int = OAI_PAGE_SIZE,
+    streaming: bool = False,
+) -> PipelineStats:
+    """
+    Harvest synthetic catalogue from local OAI server and deliver it from local file server to moto S3
+    Args:
+        record_count: number of harvested records
+        workers: pipeline worker threads
+        latency, bandwidth, error_rate: behaviour of file server, see FileServer
+        work_dir: directory for record store, ledger, metrics and local files, temporary by default
+        seed: random seed of records and errors
+        page_size: records per OAI page
+        streaming: deliver books while harvesting, see main.harvest_and_process_books
+    Returns:
+        statistics of the delivery phase
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir, FileServer(
+        latency, bandwidth, error_rate, seed=seed
+    ) as file_server:
+        work_dir = work_dir or tmp_dir
+        records = point_to_host(
+            list(generate_records(record_count, seed)), file_server.base_url
+        )
+        cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            for directory in ("books", "images", main.LOCAL_DIR):
+                os.makedirs(directory, exist_ok=True)
+            with OaiServer(records, page_size) as oai_server, s3_uploader() as uploader:
+                started = time.perf_counter()
+                if streaming:
+                    stats = main.harvest_and_process_books(
+                        endpoint=oai_server.endpoint,
+                        records_path="records.jsonl",
+                        checkpoint_path="checkpoint.json",
+                        uploader=uploader,
+                        ledger_path="ledger.sqlite",
+                        download_workers=workers,
+                        upload_workers=workers,
+                        metrics_path="metrics.prom",
+                        assets_base_url=file_server.base_url,
+                    )
+                    print(
+                        f"Streaming harvest of {oai_server.pages_served} pages and delivery "
+                        f"took {time.perf_counter() - started:.1f}s"
+                    )
+                else:
+                    main.parse_oai_archive_to_file(
+                        endpoint=oai_server.endpoint,
+                        output_path="records.jsonl",
+                        checkpoint_path="checkpoint.json",
+                    )
+                    harvested = time.perf_counter()
+                    stats = main.process_books_from_file(
+                        records_path="records.jsonl",
+                        workers=workers,
+                        uploader=uploader,
+                        ledger_path="ledger.sqlite",
+                        metrics_path="metrics.prom",
+                        assets_base_url=file_server.base_url,
+                    )
+                    print(
+                        f"Harvest of {oai_server.pages_served} pages took {harvested - started:.1f}s, "
+                        f"delivery took {stats.elapsed:.1f}s"
+                    )
+        finally:
+            os.chdir(cwd)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument(
+        "--bandwidth", type=int, default=0, help="bytes/second, 0 is unlimited"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--page-size", type=int, default=OAI_PAGE_SIZE)
+    parser.add_argument(
+        "--streaming", action="store_true", help="deliver books while harvesting"
+    )
+    parser.add_argument("--work-dir", help="keep record store, ledger and metrics here")
+    args = parser.parse_args()
+    run_pipeline(
+        args.records,
+        args.workers,
+        args.latency,
+        args.bandwidth,
+        args.error_rate,
+        args.work_dir,
+        page_size=args.page_size,
+        streaming=args.streaming,
+    )
@@ -0,0 +1,53 @@
+"""
+Microbenchmark of fields_parser.parse_date against plain dateutil.
+Run from repository root: python -m benchmarks.parse_date
+"""
+
+import timeit
+
+import dateutil.parser as date_parser
+
+from src.contants import ONIX_DATE_FORMAT
+from src.fields_parser import _format_date, parse_date
+
+NUMBER = 20_000
+# typical OAI dates: mostly ISO, many repeated, a few odd shapes
+RAW_DATES = [f"20{year:02d}-01-01T00:00:00Z" for year in range(10, 22)] + [
+    "20130101",
+    "01.01.2013",
+]
+
+
+def dateutil_only() -> None:
+    for raw_date in RAW_DATES:
+        date_parser.parse(raw_date).strftime(ONIX_DATE_FORMAT)
+
+
+def uncached() -> None:
+    for raw_date in RAW_DATES:
+        _format_date.__wrapped__(raw_date)
+
+
+def cached() -> None:
+    for raw_date in RAW_DATES:
+        parse_date([raw_date])
+
+
+def main() -> None:
+    calls = NUMBER * len(RAW_DATES)
+    baseline = None
+    for name, function in (
+        ("dateutil", dateutil_only),
+        ("fast path", uncached),
+        ("fast path + cache", cached),
+    ):
+        seconds = min(timeit.repeat(function, number=NUMBER, repeat=3))
+        baseline = baseline or seconds
+        print(
+            f"{name:>18}: {seconds / calls * 1e6:6.2f} us/date, "
+            f"{baseline / seconds:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
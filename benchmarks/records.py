@@ -0,0 +1,85 @@
+"""
+Synthetic OAI oai_dc records shaped like Open Research Library ones, for benchmarks and load tests
+"""
+
+import random
+import uuid
+from typing import Iterator
+
+SUBJECTS = [
+    ("History / Military / World War Ii", "HIS027100"),
+    ("History / Europe", "HIS010000"),
+    ("Philosophy / General", "PHI000000"),
+    ("Social Science / Sociology / General", "SOC026000"),
+    ("Science / Physics / General", "SCI055000"),
+    ("Literary Criticism / General", "LIT000000"),
+]
+LANGUAGES = ["English", "German", "French", "Spanish", "Italian"]
+FORMATS = ["application/pdf", "application/pdf", "application/epub+zip"]
+PUBLISHERS = ["Oxford University Press", "De Gruyter", "Open Book Publishers"]
+RIGHTS = [
+    "https://creativecommons.org/licenses/by/4.0/legalcode",
+    "https://wiki.creativecommons.org/wiki/public_domain",
+    "https://creativecommons.org/licenses/by-nc-nd/4.0/legalcode",
+]
+DATES = ["2013-01-01T00:00:00Z", "20150315", "06-11-1993", "2019-07-21T00:00:00Z"]
+WORDS = "open research library monograph history science society europe theory".split()
+
+
+def make_isbn(number: int) -> str:
+    """
+    Returns:
+        valid ISBN-13 with prefix 978
+    """
+    body = f"978{number % 10 ** 9:09d}"
+    total = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(body))
+    return f"{body}{(10 - total % 10) % 10}"
+
+
+def generate_records(count: int, seed: int = 0) -> Iterator[dict]:
+    """
+    Generate reproducible records with identifier lists (viewer and download links, ISBN, DOI),
+    bisacsh subjects, several creators and long descriptions
+    Args:
+        count: number of records
+        seed: random seed, the same seed gives the same records
+    Returns:
+        iterator of records
+    """
+    rng = random.Random(seed)
+    for number in range(count):
+        book_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        isbn = make_isbn(number)
+        identifier = [
+            f"https://openresearchlibrary.org/viewer/{book_id}",
+            f"ISBN:{isbn}",
+            f"DOI:https://dx.doi.org/10.5555/{isbn}",
+        ]
+        if rng.random() < 0.7:
+            identifier.insert(
+                1,
+                f"https://openresearchlibrary.org/ext/api/media/{book_id}/assets/external_content.pdf",
+            )
+        subjects = rng.sample(SUBJECTS, rng.randint(1, 3))
+        record = {
+            "identifier": identifier,
+            "title": [" ".join(rng.choices(WORDS, k=rng.randint(2, 8))).title()],
+            "language": [rng.choice(LANGUAGES)],
+            "subject": [
+                text
+                for subject in subjects
+                for text in (subject[0], f"bisacsh:{subject[1]}")
+            ],
+            "format": [rng.choice(FORMATS)],
+            "creator": [
+                f"Author{rng.randint(1, 999)}, Name{i}"
+                for i in range(rng.randint(1, 4))
+            ],
+            "description": [" ".join(rng.choices(WORDS, k=rng.randint(50, 300)))],
+            "publisher": [rng.choice(PUBLISHERS)],
+            "date": [rng.choice(DATES)],
+            "type": ["BOOK"],
+            "rights": [rng.choice(RIGHTS)],
+            "source": [f"MODID-{rng.randint(1, 500):011d}:Source"],
+        }
+        yield record
@@ -0,0 +1,49 @@
+"""
+Bitset filtering of the catalogue against a per-record scan.
+Run: python -m pytest benchmarks/test_catalogue_benchmark.py
+"""
+
+import pytest
+
+from benchmarks.conftest import run_rounds
+from src.catalogue import Catalogue
+from src.licence_filter import LicenceFilter
+
+
+@pytest.fixture(scope="module")
+def catalogue(records):
+    catalogue = Catalogue()
+    for record in records:
+        catalogue.add(record)
+    catalogue.mask("type", "BOOK")  # build bitsets outside of the measured query
+    return catalogue
+
+
+def test_select_licensed_books(benchmark, catalogue, records, record_count):
+    licence_filter = LicenceFilter()
+
+    def select():
+        licensed = catalogue.mask("type", "BOOK") & licence_filter.catalogue_mask(
+            catalogue
+        )
+        return catalogue.rows(licensed)
+
+    rows = run_rounds(benchmark, select, record_count)
+    assert rows == [
+        row
+        for row, record in enumerate(records)
+        if record["type"][0] == "BOOK" and licence_filter.is_licensed(record)
+    ]
+
+
+def test_scan_licensed_books(benchmark, records, record_count):
+    licence_filter = LicenceFilter()
+
+    def scan():
+        return [
+            row
+            for row, record in enumerate(records)
+            if record["type"][0] == "BOOK" and licence_filter.is_licensed(record)
+        ]
+
+    run_rounds(benchmark, scan, record_count)
@@ -0,0 +1,60 @@
+"""
+Throughput of the metadata pipeline over synthetic catalogues.
+Run: python -m pytest benchmarks --benchmark-autosave
+Compare with previous run: python -m pytest benchmarks --benchmark-compare
+"""
+
+import os
+
+import pytest
+
+from benchmarks.conftest import run_rounds
+from src import main, utils
+from src.contants import LOCAL_DIR
+from src.renderer import OnixRenderer
+
+
+@pytest.fixture(scope="module")
+def books(records):
+    return [main.parse_metadata_record(record) for record in records]
+
+
+@pytest.fixture
+def renderer():
+    return OnixRenderer(use_bytecode_cache=False)
+
+
+def test_parse_metadata_record(benchmark, records, record_count):
+    def parse():
+        for record in records:
+            main.parse_metadata_record(record)
+
+    run_rounds(benchmark, parse, record_count)
+
+
+def test_render_book(benchmark, books, record_count):
+    def render():
+        for book in books:
+            utils.render_book(book)
+
+    run_rounds(benchmark, render, record_count)
+
+
+def test_render_template(benchmark, books, renderer, record_count):
+    def render():
+        for book in books:
+            renderer.render(book)
+
+    run_rounds(benchmark, render, record_count)
+
+
+def test_download_metadata(benchmark, records, record_count, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir(LOCAL_DIR)
+
+    def download():
+        for record in records:
+            main.download_metadata(record)
+
+    run_rounds(benchmark, download, record_count)
+    assert len(os.listdir(LOCAL_DIR)) == record_count
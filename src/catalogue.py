@@ -0,0 +1,161 @@
+import sys
+from typing import Dict, Iterable, Iterator, List
+
+from src.contants import CATALOGUE_COLUMNS, CATALOGUE_FIRST_VALUE_COLUMNS, RECORDS_FILE
+from src.fields_parser import parse_isbn
+from src.record_store import read_records
+
+
+class Catalogue:
+    """
+    Compact columnar index of the record store for bulk filtering.
+    Every categorical column (type, rights, source, ...) maps each distinct value to a bitset
+    of rows containing it, stored as a Python int, so filters are whole-catalogue bitwise
+    operations instead of per-record dict lookups. Values are interned, ISBNs are kept per row.
+    Records themselves are not kept, see select_records.
+    Args:
+        columns: names of multi-valued record fields to index
+        first_value_columns: columns indexed by their first value only, like record['type'][0]
+    Examples:
+        catalogue = load_catalogue()
+        books = catalogue.mask("type", "BOOK")
+        licensed = books & catalogue.any_of("rights", [cc_by, public_domain])
+        isbns = catalogue.isbns(licensed)
+    """
+
+    def __init__(
+        self,
+        columns: Iterable[str] = CATALOGUE_COLUMNS,
+        first_value_columns: Iterable[str] = CATALOGUE_FIRST_VALUE_COLUMNS,
+    ):
+        self.columns = tuple(columns)
+        self.first_value_columns = frozenset(first_value_columns)
+        self.isbns_column: List[str] = []
+        self._rows: Dict[str, Dict[str, List[int]]] = {
+            column: {} for column in self.columns
+        }
+        self._masks: Dict[str, Dict[str, int]] = {}
+        self._masked_rows = 0
+
+    def __len__(self) -> int:
+        return len(self.isbns_column)
+
+    def add(self, record: dict) -> None:
+        """Append record as the next row"""
+        row = len(self.isbns_column)
+        self.isbns_column.append(parse_isbn(record.get("identifier")))
+        for column in self.columns:
+            values = record.get(column) or []
+            if column in self.first_value_columns:
+                values = values[:1]
+            rows = self._rows[column]
+            for value in set(values):
+                if isinstance(value, str):
+                    rows.setdefault(sys.intern(value), []).append(row)
+
+    def _build_masks(self) -> None:
+        size = len(self) // 8 + 1
+        for column, rows_by_value in self._rows.items():
+            masks = {}
+            for value, rows in rows_by_value.items():
+                bits = bytearray(size)
+                for row in rows:
+                    bits[row >> 3] |= 1 << (row & 7)
+                masks[value] = int.from_bytes(bits, "little")
+            self._masks[column] = masks
+        self._masked_rows = len(self)
+
+    def values(self, column: str) -> List[str]:
+        """
+        Returns:
+            distinct values of the column
+        """
+        return list(self._rows[column])
+
+    def mask(self, column: str, value: str) -> int:
+        """
+        Returns:
+            bitset of rows which have value in the column
+        """
+        if self._masked_rows != len(self) or not self._masks:
+            self._build_masks()
+        return self._masks[column].get(value, 0)
+
+    def any_of(self, column: str, values: Iterable[str]) -> int:
+        """
+        Returns:
+            bitset of rows which have any of values in the column
+        """
+        mask = 0
+        for value in values:
+            mask |= self.mask(column, value)
+        return mask
+
+    def all_rows(self) -> int:
+        return (1 << len(self)) - 1
+
+    @staticmethod
+    def rows(mask: int) -> List[int]:
+        """
+        Returns:
+            row numbers in the bitset, ascending
+        """
+        bits = bin(mask)[:1:-1]
+        rows = []
+        row = bits.find("1")
+        while row != -1:
+            rows.append(row)
+            row = bits.find("1", row + 1)
+        return rows
+
+    @staticmethod
+    def count(mask: int) -> int:
+        return bin(mask).count("1")
+
+    def isbns(self, mask: int) -> List[str]:
+        """
+        Returns:
+            ISBNs of rows in the bitset, rows without valid ISBN are skipped
+        """
+        return [
+            self.isbns_column[row] for row in self.rows(mask) if self.isbns_column[row]
+        ]
+
+
+def load_catalogue(
+    path: str = RECORDS_FILE, columns: Iterable[str] = CATALOGUE_COLUMNS
+) -> Catalogue:
+    """
+    Read the record store once into a catalogue
+    Args:
+        path: path to record store
+        columns: record fields to index
+    Returns:
+        catalogue with one row per record, in order of the record store
+    """
+    catalogue = Catalogue(columns)
+    for record in read_records(path):
+        catalogue.add(record)
+    return catalogue
+
+
+def select_records(path: str, mask: int) -> Iterator[dict]:
+    """
+    Stream records of the rows in the bitset from the record store the catalogue was loaded from
+    Args:
+        path: path to record store
+        mask: bitset of rows, see Catalogue.mask
+    Returns:
+        iterator of selected records
+    """
+    rows = Catalogue.rows(mask)
+    if not rows:
+        return
+    selected = iter(rows)
+    next_row = next(selected)
+    for row, record in enumerate(read_records(path)):
+        if row == next_row:
+            yield record
+            next_row = next(selected, None)
+            if next_row is None:
+                return
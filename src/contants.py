@@ -1,7 +1,86 @@
 ONIX_DATE_FORMAT = "%Y%m%d"
+# number of distinct raw dates remembered by fields_parser.parse_date
+DATE_CACHE_SIZE = 4096
+# number of identifier lists remembered by fields_parser.classify_identifiers
+IDENTIFIER_CACHE_SIZE = 1024
 TEMPLATE_FILE = "metadata_template.j2"
+HEADER_TEMPLATE_FILE = "onix_header.j2"
+PRODUCT_TEMPLATE_FILE = "onix_product.j2"
+ONIX_MESSAGE_END = "</ONIXMessage>"
+ONIX_BATCH_MAX_PRODUCTS = 1000
+ONIX_BATCH_MAX_BYTES = 50 * 1024 * 1024
 LOCAL_DIR = "metadata"
 
+OAI_ENDPOINT = "https://catalog.openresearchlibrary.org/oai"
+OAI_DATESTAMP_FORMAT = "%Y-%m-%d"
+RECORDS_FILE = "output_right.jsonl"
+# OAI header identifier stored with every harvested record, see record_store.compact_records
+OAI_IDENTIFIER_FIELD = "oai_identifier"
+LICENSED_RECORDS_FILE = "output_final.jsonl"
+HARVEST_CHECKPOINT_FILE = "harvest_checkpoint.json"
+LEDGER_FILE = "delivery_ledger.sqlite"
+# records with any of these rights or from any of these sources may be distributed.
+# Licence URLs are base paths, sub-pages like .../legalcode or .../deed.de match too
+LICENCE_URLS = (
+    "https://creativecommons.org/licenses/by/4.0",
+    "https://wiki.creativecommons.org/wiki/public_domain",
+)
+LICENSED_SOURCE_IDS = ("MODID-00000000488",)  # Knowledge Unlatched
+# multi-valued record fields indexed by catalogue.Catalogue
+CATALOGUE_COLUMNS = ("type", "rights", "source", "language", "format", "publisher")
+# catalogue columns where only the first value counts, e.g. record["type"][0] == "BOOK"
+CATALOGUE_FIRST_VALUE_COLUMNS = ("type",)
+# OAI fields consumed by main.parse_metadata_record
+FINGERPRINT_FIELDS = (
+    "identifier",
+    "title",
+    "language",
+    "subject",
+    "format",
+    "creator",
+    "contributor",
+    "description",
+    "publisher",
+    "date",
+)
+
+ORL_BASE_URL = "https://openresearchlibrary.org"
+ORL_HOST = "openresearchlibrary.org"
+ORL_MAX_CONNECTIONS = 4
+PIPELINE_WORKERS = 8
+# parent of all project loggers, see log_config.configure_logging
+LOGGER_NAME = "orl"
+# max number of logged warnings per field, the rest is only counted
+FIELD_WARNING_LOG_LIMIT = 10
+METRICS_FILE = "metrics.prom"
+METRICS_PREFIX = "orl_pipeline"
+# upper bounds of stage latency histogram buckets, in seconds
+METRICS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+# concurrency limits and queue capacity of pipeline.run_stages
+STAGE_RENDER_WORKERS = 2
+STAGE_DOWNLOAD_WORKERS = PIPELINE_WORKERS
+STAGE_UPLOAD_WORKERS = PIPELINE_WORKERS
+STAGE_QUEUE_SIZE = 4 * PIPELINE_WORKERS
+# records sent to a metadata worker process at once
+METADATA_CHUNK_SIZE = 200
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+HTTP_POOL_SIZE = PIPELINE_WORKERS
+HTTP_MAX_RETRIES = 5
+HTTP_BACKOFF_FACTOR = 0.5
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+AWS_PROFILE = "prod"
+S3_BUCKET = "plgo-ebooks-bucket"
+S3_PREFIX = "content/open_research_library_iudilif"
+S3_MULTIPART_THRESHOLD = 16 * 1024 * 1024
+S3_MULTIPART_CHUNK_SIZE = 16 * 1024 * 1024
+S3_MAX_CONCURRENCY = 8
+UPLOAD_MAX_WORKERS = 16
+
+DB_POOL_SIZE = 4
+DB_BULK_CHUNK_SIZE = 500
+DB_SELECT_CHUNK_SIZE = 1000
+
 BOOK_TEMPLATE = {
     "isbn13": "",
     "title.title_text": "",
@@ -0,0 +1,250 @@
+import os
+import tempfile
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.contants import (
+    DOWNLOAD_CHUNK_SIZE,
+    HTTP_POOL_SIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_FACTOR,
+    HTTP_RETRY_STATUSES,
+)
+from src.metrics import metrics
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_session(
+    pool_size: int = HTTP_POOL_SIZE,
+    max_retries: int = HTTP_MAX_RETRIES,
+    backoff_factor: float = HTTP_BACKOFF_FACTOR,
+) -> requests.Session:
+    """
+    Create HTTP session with keep-alive connection pool and retries.
+    Connection errors and statuses from HTTP_RETRY_STATUSES are retried with exponential
+    backoff (backoff_factor * 2 ** retry seconds), Retry-After header of the server wins.
+    Args:
+        pool_size: max number of kept-alive connections per host, should match number of workers
+        max_retries: max number of retries of a single request
+        backoff_factor: base of exponential backoff, in seconds
+    Returns:
+        session
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+        pool_block=True,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Returns:
+        process-wide session shared by all download functions and pipeline workers
+    """
+    global _session  # pylint: disable=global-statement
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+    return _session
+
+
+def get_conditional_headers(validators: dict = None) -> dict:
+    """
+    Args:
+        validators: validators of previous download, see get_validators
+    Returns:
+        If-None-Match/If-Modified-Since headers revalidating previous download
+    """
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def get_validators(response: requests.Response) -> dict:
+    """
+    Returns:
+        ETag, Last-Modified and Content-Length of the response, missing headers are None
+    """
+    content_length = response.headers.get("Content-Length")
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_length": int(content_length) if content_length else None,
+    }
+
+
+def _get(
+    session: requests.Session, url: str, validators: dict = None
+) -> requests.Response:
+    return (session or get_session()).get(
+        url, stream=True, headers=get_conditional_headers(validators)
+    )
+
+
+def _check_status(response: requests.Response, url: str) -> None:
+    if response.status_code != 200:
+        raise ValueError(f"Failed to download {url}: HTTP {response.status_code}")
+
+
+def _is_not_modified(
+    response: requests.Response, url: str, validators: dict = None
+) -> bool:
+    if validators is not None and response.status_code == 304:
+        return True
+    _check_status(response, url)
+    if validators is not None:
+        validators.update(get_validators(response))
+    return False
+
+
+@metrics.timed("download")
+def download_to_file(
+    url: str,
+    file_path: str,
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    session: requests.Session = None,
+    digest=None,
+    validators: dict = None,
+) -> requests.Response:
+    """
+    Stream HTTP response body to a local file in chunks, so memory use doesn't depend on file size.
+    The body is written to a temporary file in the destination directory and renamed
+    when complete, so file_path never contains a partial download.
+    Args:
+        url: URL to download
+        file_path: destination file path
+        chunk_size: size of chunks read from the network, in bytes
+        session: HTTP session, process-wide session by default
+        digest: hashlib object, updated with every received chunk
+        validators: validators of previous download to revalidate it with a conditional request,
+            updated in place with validators of the new download. Empty dict for unconditional
+            request which still collects validators
+    Returns:
+        response, body is already consumed. Status 304 means the previous download
+        is still valid and nothing was written
+    Raises:
+        ValueError: if response status isn't 200 (or 304 with validators)
+            or number of received bytes doesn't match Content-Length
+    """
+    with _get(session, url, validators) as response:
+        if _is_not_modified(response, url, validators):
+            return response
+        file_dir = os.path.dirname(file_path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=file_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+                    if digest is not None:
+                        digest.update(chunk)
+            expected_length = response.headers.get("Content-Length")
+            received_length = response.raw.tell()
+            if expected_length is not None and int(expected_length) != received_length:
+                raise ValueError(
+                    f"Incomplete download of {url}: received {received_length} "
+                    f"of {expected_length} bytes"
+                )
+            os.replace(tmp_path, file_path)
+            metrics.inc("bytes_total", received_length, direction="download")
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    return response
+
+
+class _CheckedReader:
+    """
+    File-like wrapper of HTTP response body, updating digest with everything read.
+    The read hitting the end of a body shorter than Content-Length raises, so the S3 upload
+    reading from it is aborted before the object is written
+    """
+
+    def __init__(self, stream, url: str, expected_length: str = None, digest=None):
+        self.stream = stream
+        self.url = url
+        self.expected_length = expected_length
+        self.digest = digest
+
+    @property
+    def received_length(self) -> int:
+        """Number of body bytes received, before content decoding"""
+        return self.stream.tell()
+
+    def read(self, *args) -> bytes:
+        data = self.stream.read(*args)
+        if self.digest is not None:
+            self.digest.update(data)
+        size = args[0] if args else None
+        at_end = size is None or size < 0 or len(data) < size
+        if (
+            at_end
+            and self.expected_length is not None
+            and int(self.expected_length) != self.received_length
+        ):
+            raise ValueError(
+                f"Incomplete download of {self.url}: received {self.received_length} "
+                f"of {self.expected_length} bytes"
+            )
+        return data
+
+
+@metrics.timed("stream_to_s3")
+def download_to_s3(
+    url: str,
+    uploader,
+    file_name: str,
+    session: requests.Session = None,
+    digest=None,
+    validators: dict = None,
+) -> str:
+    """
+    Stream HTTP response body straight into S3 multipart upload, without local file.
+    Memory use is bounded by the multipart chunk size of the S3 transfer.
+    An incomplete body aborts the upload, so an existing object under file_name is kept
+    Args:
+        url: URL to download
+        uploader: uploader.S3Uploader of the destination bucket
+        file_name: destination file name
+        session: HTTP session, process-wide session by default
+        digest: hashlib object, updated with everything uploaded
+        validators: validators of previous download, see download_to_file
+    Returns:
+        S3 key of uploaded object, empty string if previous download is still valid (HTTP 304)
+    Raises:
+        ValueError: if response status isn't 200 (or 304 with validators), upload failed
+            or number of received bytes doesn't match Content-Length
+    """
+    with _get(session, url, validators) as response:
+        if _is_not_modified(response, url, validators):
+            return ""
+        response.raw.decode_content = True
+        stream = _CheckedReader(
+            response.raw, url, response.headers.get("Content-Length"), digest
+        )
+        s3_key = uploader.upload_fileobj(stream, file_name)
+    metrics.inc("bytes_total", stream.received_length, direction="download")
+    metrics.inc("bytes_total", stream.received_length, direction="upload")
+    return s3_key
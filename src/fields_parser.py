@@ -1,8 +1,78 @@
-from typing import List
+import calendar
+import logging
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
 
 import dateutil.parser as date_parser
 
-from src.contants import ONIX_DATE_FORMAT
+from src.contants import (
+    ONIX_DATE_FORMAT,
+    DATE_CACHE_SIZE,
+    IDENTIFIER_CACHE_SIZE,
+    LOGGER_NAME,
+    FIELD_WARNING_LOG_LIMIT,
+    ORL_BASE_URL,
+)
+
+logger = logging.getLogger(f"{LOGGER_NAME}.fields_parser")
+_warning_counts = Counter()
+_warning_lock = threading.Lock()
+
+# ISO date with optional time in UTC, e.g. 2013-01-01T00:00:00Z, the usual shape of OAI dates
+ISO_DATE = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.\d+)?)?Z?)?"
+)
+COMPACT_DATE = re.compile(r"(\d{4})(\d{2})(\d{2})")
+YEAR = re.compile(r"\d{4}")
+
+
+def warn(field: str, message: str, *args) -> None:
+    """
+    Count warning about malformed field of a record. Only first FIELD_WARNING_LOG_LIMIT warnings
+    per field are logged, the rest is summarised by log_warning_summary
+    Args:
+        field: record field, e.g. 'date'
+        message: logging format string, formatted with args only if it is logged
+    """
+    with _warning_lock:
+        _warning_counts[field] += 1
+        count = _warning_counts[field]
+    if count <= FIELD_WARNING_LOG_LIMIT:
+        logger.warning(message, *args, extra={"field": field})
+    else:
+        logger.debug(message, *args, extra={"field": field})
+
+
+def get_warning_counts() -> dict:
+    """
+    Returns:
+        number of warnings per field since the last reset
+    """
+    with _warning_lock:
+        return dict(_warning_counts)
+
+
+def merge_warning_counts(counts: dict) -> None:
+    """Add warning counts of another process, e.g. of a metadata worker"""
+    with _warning_lock:
+        _warning_counts.update(counts)
+
+
+def reset_warning_counts() -> None:
+    with _warning_lock:
+        _warning_counts.clear()
+
+
+def log_warning_summary() -> None:
+    """Log one line per field with total number of warnings"""
+    for field, count in sorted(get_warning_counts().items()):
+        logger.warning(
+            "%d warnings about %s", count, field, extra={"field": field, "count": count}
+        )
 
 
 def parse_creator(raw_creator: List[str]) -> str:
@@ -17,14 +87,14 @@ def parse_creator(raw_creator: List[str]) -> str:
         Output: 'Harry Potter, Hermione Granger'
     """
     formatted_names = []
-    print(f"Name: {raw_creator}")
+    logger.debug("Name: %s", raw_creator)
     if not isinstance(raw_creator, List):
-        print(f"WARNING: Wrong input type: '{type(raw_creator)}', expected List")
+        warn("creator", "Wrong input type: '%s', expected List", type(raw_creator))
         return ""
     for creator in raw_creator:
         # Format names like 'Potter, Harry' to 'Harry Potter'
         if not isinstance(creator, str):
-            print(f"WARNING: non-string creator value: {creator}. Skipping...")
+            warn("creator", "non-string creator value: %s. Skipping...", creator)
             continue
         if "," in creator and len(creator.split(",")) == 2:
             surname, name = creator.split(",")
@@ -49,18 +119,57 @@ def parse_date(raw_date: List[str]) -> str:
     """
     default_date = "20210101"
     if not isinstance(raw_date, List) or not raw_date[0]:
-        print(f"WARNING: Wrong publishing date: {raw_date}, expected: List[str]")
+        warn("date", "Wrong publishing date: %s, expected: List[str]", raw_date)
         return default_date
-    try:
-        final_date = date_parser.parse(raw_date[0]).strftime(ONIX_DATE_FORMAT)
-    except OverflowError:
-        print(
-            f"Error during parsing publishing date: {raw_date}(Wrong date format?). Returning default date: 20210101"
+    if YEAR.fullmatch(raw_date[0]):
+        final_date = _format_year(raw_date[0])
+    else:
+        final_date = _format_date(raw_date[0])
+    if not final_date:
+        warn(
+            "date",
+            "Error during parsing publishing date: %s(Wrong date format?). Returning default date: 20210101",
+            raw_date,
         )
         final_date = default_date
     return final_date
 
 
+def _format_year(raw_year: str) -> str:
+    """
+    Year only date gets month and day of today, same as dateutil.
+    Not cached, because the result changes every day
+    """
+    today = datetime.now()
+    try:
+        year = int(raw_year)
+        day = min(today.day, calendar.monthrange(year, today.month)[1])
+        return datetime(year, today.month, day).strftime(ONIX_DATE_FORMAT)
+    except ValueError:
+        return _format_date(raw_year)
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _format_date(raw_date: str) -> str:
+    """
+    Format ISO and YYYYMMDD dates without dateutil, other shapes (e.g. 01.01.2013)
+    and invalid dates fall back to dateutil, so results and errors match it
+    Returns:
+        date in format YYYYMMDD, empty string if the date is out of range
+    """
+    match = ISO_DATE.fullmatch(raw_date) or COMPACT_DATE.fullmatch(raw_date)
+    if match:
+        try:
+            parts = [int(part) for part in match.groups() if part is not None]
+            return datetime(*parts).strftime(ONIX_DATE_FORMAT)
+        except ValueError:
+            pass
+    try:
+        return date_parser.parse(raw_date).strftime(ONIX_DATE_FORMAT)
+    except OverflowError:
+        return ""
+
+
 def parse_description(raw_description: List[str]) -> str:
     """
     Parses description and return description text
@@ -74,7 +183,7 @@ def parse_description(raw_description: List[str]) -> str:
         or not isinstance(raw_description[0], str)
         or len(raw_description[0]) == 0
     ):
-        print(f"WARNING: found wrong description: {raw_description}")
+        warn("description", "found wrong description: %s", raw_description)
         return ""
     return raw_description[0]
 
@@ -91,7 +200,7 @@ def parse_format(raw_format: List[str]) -> str:
         Output: PDF
     """
     if not raw_format or not isinstance(raw_format, List):
-        print(f"WARNING: Wrong format: {raw_format}. Skipping...")
+        warn("format", "Wrong format: %s. Skipping...", raw_format)
         return ""
     final_format = ""
     if "pdf" in raw_format[0].lower():
@@ -99,13 +208,117 @@ def parse_format(raw_format: List[str]) -> str:
     elif "epub" in raw_format[0].lower():
         final_format = "EPUB"
     else:
-        print(f"WARNING: Unknown format: {raw_format[0]}. Skipping...")
+        warn("format", "Unknown format: %s. Skipping...", raw_format[0])
     return final_format
 
 
+class Identifiers(NamedTuple):
+    """
+    Identifiers of one record, see classify_identifiers. Immutable, as one instance is shared
+    by all callers classifying the same identifier list
+    Attributes:
+        isbn: verified ISBN-13 or empty string
+        doi: DOI without resolver prefix, e.g. 10.1093/acprof:oso/9780199660797.001.0001, or empty string
+        viewer_id: book identifier from the viewer link or empty string
+        download_link: link to download book, generated from viewer_id if the record has none,
+            or empty string
+        assets_url: URL of book assets (book file, thumbnail) under the assets base URL,
+            or empty string
+    """
+
+    isbn: str = ""
+    doi: str = ""
+    viewer_id: str = ""
+    download_link: str = ""
+    assets_url: str = ""
+
+
+def is_valid_isbn13(isbn: str) -> bool:
+    """
+    Returns:
+        True if isbn is 13 digits long, starts with 97 (Bookland) and has valid check digit
+    """
+    if not (isbn.isdigit() and len(isbn) == 13 and isbn.startswith("97")):
+        return False
+    total = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(isbn))
+    return total % 10 == 0
+
+
+def classify_identifiers(
+    raw_identifier: List[str], assets_base_url: str = ORL_BASE_URL
+) -> Identifiers:
+    """
+    Walk raw identifier list once and sort out ISBN, DOI, viewer link and download link.
+    Results are memoised, so parse_isbn, parse_download_link, parse_book_identifier
+    and main helpers called for the same record share one pass.
+    Nothing is counted here, as one record is classified by several helpers;
+    ISBN warnings are counted by parse_isbn, once per parsed record
+    Args:
+        raw_identifier: list of identifiers, contains download link and/or viewer link, ISBN and DOI
+        assets_base_url: host serving book assets, the assets URL and the missing download link
+            are generated under it
+    Returns:
+        classified identifiers, empty ones if input is not a list
+    """
+    return _classify_with_warning(raw_identifier, assets_base_url)[0]
+
+
+def _classify_with_warning(
+    raw_identifier: List[str], assets_base_url: str = ORL_BASE_URL
+) -> Tuple[Identifiers, Optional[Tuple[str, str, object]]]:
+    """
+    Returns:
+        classified identifiers and warning about their ISBN as (field, message, value) or None
+    """
+    if not raw_identifier or not isinstance(raw_identifier, List):
+        return Identifiers(), ("identifier", "wrong identifier: %s", raw_identifier)
+    return _classify_identifiers(tuple(raw_identifier), assets_base_url)
+
+
+@lru_cache(maxsize=IDENTIFIER_CACHE_SIZE)
+def _classify_identifiers(
+    raw_identifier: tuple, assets_base_url: str
+) -> Tuple[Identifiers, Optional[Tuple[str, str, tuple]]]:
+    raw_isbn = []
+    doi = viewer_link = download_link = ""
+    for element in raw_identifier:
+        if not isinstance(element, str):
+            continue
+        lowered = element.lower()
+        if "isbn" in lowered:
+            raw_isbn.append(element.split(":")[-1])
+        if "external_content" in lowered and not download_link:
+            download_link = element
+        if "viewer" in lowered and not viewer_link:
+            viewer_link = element
+        if not doi:
+            if "doi.org/" in lowered:
+                doi = element[lowered.index("doi.org/") + len("doi.org/") :]
+            elif lowered.startswith("doi:"):
+                doi = element[len("doi:") :]
+
+    isbn = ""
+    isbn_warning = None
+    if len(raw_isbn) == 0:
+        isbn_warning = ("isbn", "ISBN not found in input: %s", raw_identifier)
+    elif len(raw_isbn) > 1:
+        isbn_warning = ("isbn", "More than one ISBN were found: %s", tuple(raw_isbn))
+    elif is_valid_isbn13(raw_isbn[0]):
+        isbn = raw_isbn[0]
+
+    viewer_id = viewer_link.split("/")[-1]
+    assets_url = ""
+    if viewer_id:
+        assets_url = f"{assets_base_url}/ext/api/media/{viewer_id}/assets"
+    if not download_link and assets_url:
+        download_link = f"{assets_url}/external_content.pdf"
+    return Identifiers(isbn, doi, viewer_id, download_link, assets_url), isbn_warning
+
+
 def parse_isbn(raw_identifier: List[str]) -> str:
     """
-    Parse and validate ISBN from raw identifier list
+    Parse and validate ISBN from raw identifier list.
+    Missing or ambiguous ISBN is counted as a warning on every call, so call it once per record
     Args:
         raw_identifier: list of identifiers, contains download link and/or viewer link, ISBN and DOI
     Returns:
@@ -118,32 +331,19 @@ def parse_isbn(raw_identifier: List[str]) -> str:
         Output:
             9780199660797
     """
-    raw_isbn = [
-        element.split(":")[-1]
-        for element in raw_identifier
-        if "isbn" in element.lower()
-    ]
-    if len(raw_isbn) == 0:
-        print(f"WARNING: ISBN not found in input: {raw_identifier}")
-        return ""
-    elif len(raw_isbn) > 1:
-        print(f"WARNING: More than one ISBN were found: {raw_isbn}")
-        return ""
-    else:
-        isbn = raw_isbn[0]
-    if isbn.isnumeric() and len(isbn) == 13 and isbn.startswith("97"):
-        return isbn
-    else:
-        # print(f"WARNING: wrong ISBN: {isbn}, check that length and format")
-        return ""
+    identifiers, warning = _classify_with_warning(raw_identifier)
+    if warning is not None:
+        field, message, value = warning
+        warn(field, message, list(value) if isinstance(value, tuple) else value)
+    return identifiers.isbn
 
 
 def parse_book_identifier(raw_identifier: List[str]) -> str:
-    viewer_link = [
-        element for element in raw_identifier if "viewer" in element.lower()
-    ][0]
-    book_identifier = viewer_link.split("/")[-1]
-    return book_identifier
+    """
+    Returns:
+        book identifier from the viewer link or empty string
+    """
+    return classify_identifiers(raw_identifier).viewer_id
 
 
 def parse_download_link(raw_identifier: List[str]) -> str:
@@ -152,20 +352,9 @@ def parse_download_link(raw_identifier: List[str]) -> str:
     Args:
         raw_identifier: list of identifiers, contains download link and/or viewer link, ISBN and DOI
     Returns:
-        Link to download book
+        Link to download book or empty string
     """
-    if not raw_identifier or not isinstance(raw_identifier, List):
-        print(f"WARNING: wrong identifier: {raw_identifier}")
-        return ""
-    links = [
-        element for element in raw_identifier if "external_content" in element.lower()
-    ]
-    if not links:
-        book_identifier = parse_book_identifier(raw_identifier)
-        download_link = f"https://openresearchlibrary.org/ext/api/media/{book_identifier}/assets/external_content.pdf"
-    else:
-        download_link = links[0]
-    return download_link
+    return classify_identifiers(raw_identifier).download_link
 
 
 def parse_language(raw_language: List[str]) -> str:
@@ -178,7 +367,7 @@ def parse_language(raw_language: List[str]) -> str:
         Output: "1"
     """
     if not raw_language or not isinstance(raw_language, List):
-        print(f"WARNING: wrong language: {raw_language}")
+        warn("language", "wrong language: %s", raw_language)
         return ""
     return raw_language[0]
 
@@ -195,7 +384,7 @@ def parse_publisher(raw_publisher: List[str]) -> str:
         Output: 'Oxford University Press'
     """
     if not raw_publisher or not isinstance(raw_publisher, List):
-        print(f"WARNING: wrong publisher: {raw_publisher}")
+        warn("publisher", "wrong publisher: %s", raw_publisher)
         return ""
     return str(raw_publisher[0])
 
@@ -208,7 +397,7 @@ def parse_title(raw_title: List[str]) -> str:
         parsed title or empty string
     """
     if not raw_title or not isinstance(raw_title, List):
-        print(f"WARNING: wrong title: {raw_title}")
+        warn("title", "wrong title: %s", raw_title)
         return ""
     return str(raw_title[0])
 
@@ -230,7 +419,7 @@ def parse_subject(raw_subject: List[str]) -> List[str]:
             ['HIS027100', 'HIS010000', 'HIS037070']
     """
     if not raw_subject or not isinstance(raw_subject, List):
-        print(f"WARNING: wrong subject: {raw_subject}")
+        warn("subject", "wrong subject: %s", raw_subject)
         return []
     bisacs = []
     for subject in raw_subject:
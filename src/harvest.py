@@ -0,0 +1,124 @@
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Iterator, List
+
+from sickle import Sickle
+from sickle.iterator import OAIResponseIterator
+from sickle.models import Record
+from sickle.oaiexceptions import BadResumptionToken, NoRecordsMatch
+
+from src.contants import OAI_DATESTAMP_FORMAT
+from src.metrics import metrics
+
+OAI_NAMESPACE = "{http://www.openarchives.org/OAI/2.0/}"
+
+
+def load_checkpoint(checkpoint_path: str) -> dict:
+    """
+    Read harvest checkpoint from disk
+    Args:
+        checkpoint_path: path to JSON checkpoint file
+    Returns:
+        dict with keys: from (datestamp of the last successful harvest or None),
+        resumption_token (token of the next page to fetch or None),
+        started (datestamp of the run that issued the resumption token or None)
+    """
+    checkpoint = {"from": None, "resumption_token": None, "started": None}
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as checkpoint_file:
+            checkpoint.update(json.load(checkpoint_file))
+    return checkpoint
+
+
+def save_checkpoint(checkpoint_path: str, checkpoint: dict) -> None:
+    """
+    Atomically write harvest checkpoint, so a crash never leaves a half-written file
+    Args:
+        checkpoint_path: path to JSON checkpoint file
+        checkpoint: dict produced by load_checkpoint
+    Returns:
+        None
+    """
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+    os.replace(tmp_path, checkpoint_path)
+
+
+def parse_records_page(response) -> List[Record]:
+    """
+    Extract non-deleted records from a single ListRecords response page
+    Args:
+        response: sickle OAIResponse
+    Returns:
+        list of sickle Records
+    """
+    records = []
+    for element in response.xml.iterfind(f".//{OAI_NAMESPACE}record"):
+        record = Record(element)
+        if not record.deleted:
+            records.append(record)
+    return records
+
+
+def harvest_pages(
+    endpoint: str, checkpoint_path: str, metadata_prefix: str = "oai_dc"
+) -> Iterator[List[Record]]:
+    """
+    Incrementally harvest OAI-PMH records page by page.
+    A fresh run asks only for records changed since the last successful harvest ('from' datestamp),
+    a crashed run continues from the stored resumptionToken.
+    The checkpoint is advanced after the caller has consumed each page,
+    so the caller must persist the page before asking for the next one.
+    Args:
+        endpoint: OAI-PMH endpoint URL
+        checkpoint_path: path to JSON checkpoint file
+        metadata_prefix: OAI metadata format
+    Returns:
+        iterator over pages, every page is a list of sickle Records
+    """
+    checkpoint = load_checkpoint(checkpoint_path)
+    sickle = Sickle(endpoint, iterator=OAIResponseIterator)
+
+    if checkpoint["resumption_token"]:
+        print(f"Resuming harvest from token {checkpoint['resumption_token']}")
+        params = dict(resumptionToken=checkpoint["resumption_token"])
+    else:
+        checkpoint["started"] = datetime.now(timezone.utc).strftime(
+            OAI_DATESTAMP_FORMAT
+        )
+        params = dict(metadataPrefix=metadata_prefix)
+        if checkpoint["from"]:
+            print(f"Harvesting records changed since {checkpoint['from']}")
+            params["from"] = checkpoint["from"]
+
+    try:
+        started = time.perf_counter()
+        responses = sickle.ListRecords(**params)
+        for response in responses:
+            page = parse_records_page(response)
+            metrics.observe("harvest_page", time.perf_counter() - started)
+            yield page
+            token = responses.resumption_token
+            checkpoint["resumption_token"] = token.token if token else None
+            save_checkpoint(checkpoint_path, checkpoint)
+            started = time.perf_counter()
+    except BadResumptionToken:
+        print(
+            f"WARNING: resumption token expired, restarting harvest from {checkpoint['from']}"
+        )
+        checkpoint["resumption_token"] = None
+        save_checkpoint(checkpoint_path, checkpoint)
+        yield from harvest_pages(endpoint, checkpoint_path, metadata_prefix)
+        return
+    except NoRecordsMatch:
+        print("No records changed since the last harvest")
+
+    checkpoint["from"] = checkpoint["started"]
+    checkpoint["resumption_token"] = None
+    checkpoint["started"] = None
+    save_checkpoint(checkpoint_path, checkpoint)
@@ -0,0 +1,129 @@
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+from src.contants import LEDGER_FILE
+
+METADATA = "metadata"
+BOOK = "book"
+COVER = "cover"
+
+
+class DeliveryLedger:
+    """
+    Local SQLite record of delivered artefacts (metadata, book, cover) per ISBN,
+    so reruns only do new or changed work. Safe to share between pipeline workers.
+    Args:
+        path: path to SQLite database file, ':memory:' for a throwaway ledger
+    Examples:
+        with DeliveryLedger() as ledger:
+            if not ledger.is_delivered("9780199660797", BOOK):
+                ...
+                ledger.record("9780199660797", BOOK, content_hash, s3_key)
+    """
+
+    def __init__(self, path: str = LEDGER_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS deliveries (
+                isbn TEXT NOT NULL,
+                artefact TEXT NOT NULL,
+                content_hash TEXT,
+                s3_key TEXT,
+                delivered_at TEXT NOT NULL,
+                PRIMARY KEY (isbn, artefact)
+            )
+            """)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS validators (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_length INTEGER,
+                checked_at TEXT NOT NULL
+            )
+            """)
+
+    def get(self, isbn: str, artefact: str) -> Optional[dict]:
+        """
+        Returns:
+            delivery with content_hash, s3_key and delivered_at or None if never delivered
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM deliveries WHERE isbn = ? AND artefact = ?",
+                (isbn, artefact),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def is_delivered(self, isbn: str, artefact: str, content_hash: str = None) -> bool:
+        """
+        Args:
+            isbn: book ISBN
+            artefact: METADATA, BOOK or COVER
+            content_hash: if given, delivery counts only if it had the same content hash
+        Returns:
+            True if the artefact was delivered before and is unchanged
+        """
+        if not isbn:
+            return False
+        delivery = self.get(isbn, artefact)
+        if delivery is None:
+            return False
+        return content_hash is None or delivery["content_hash"] == content_hash
+
+    def record(self, isbn: str, artefact: str, content_hash: str, s3_key: str) -> None:
+        """Save or replace delivery of the artefact"""
+        if not isbn:
+            return
+        delivered_at = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO deliveries VALUES (?, ?, ?, ?, ?)",
+                (isbn, artefact, content_hash, s3_key, delivered_at),
+            )
+
+    def get_validators(self, url: str) -> dict:
+        """
+        Returns:
+            etag, last_modified and content_length of the last download of the URL,
+            empty dict if never downloaded
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT etag, last_modified, content_length FROM validators WHERE url = ?",
+                (url,),
+            ).fetchone()
+        return dict(row) if row else {}
+
+    def record_validators(self, url: str, validators: dict) -> None:
+        """Save or replace HTTP validators of the last download of the URL, see downloader.get_validators"""
+        checked_at = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO validators VALUES (?, ?, ?, ?, ?)",
+                (
+                    url,
+                    validators.get("etag"),
+                    validators.get("last_modified"),
+                    validators.get("content_length"),
+                    checked_at,
+                ),
+            )
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
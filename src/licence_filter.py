@@ -0,0 +1,100 @@
+from functools import lru_cache
+from typing import Iterable, Iterator
+
+from src.catalogue import Catalogue
+from src.contants import LICENCE_URLS, LICENSED_SOURCE_IDS
+
+
+@lru_cache(maxsize=1024)
+def normalise_rights(rights: str) -> str:
+    """
+    Normalise licence URL, so spelling variants of the same URL compare equal
+    Returns:
+        lower-case URL without scheme, 'www.', query and trailing slash
+    Examples:
+        Input: 'HTTP://www.CreativeCommons.org/licenses/by/4.0/ '
+        Output: 'creativecommons.org/licenses/by/4.0'
+    """
+    rights = rights.strip().lower()
+    for prefix in ("https://", "http://"):
+        if rights.startswith(prefix):
+            rights = rights[len(prefix) :]
+    if rights.startswith("www."):
+        rights = rights[len("www.") :]
+    return rights.split("?")[0].split("#")[0].rstrip("/")
+
+
+def get_source_id(source: str) -> str:
+    """
+    Examples:
+        Input: 'MODID-00000000488:Knowledge Unlatched'
+        Output: 'MODID-00000000488'
+    """
+    return source.split(":")[0].strip().upper()
+
+
+class LicenceFilter:
+    """
+    Selects records we are allowed to distribute: rights match one of licence URLs
+    or source is one of licensed sources (e.g. Knowledge Unlatched).
+    Licence URLs are normalised once into a set of paths; a rights value matches if it or
+    any of its parent paths is in the set, so '.../licenses/by/4.0' also matches
+    '.../licenses/by/4.0/legalcode', but not '.../licenses/by-nc-nd/4.0'
+    Args:
+        licence_urls: licence URLs to accept
+        source_ids: source ids to accept, e.g. MODID-00000000488
+    Examples:
+        licence_filter = LicenceFilter()
+        licensed = [record for record in records if licence_filter.is_licensed(record)]
+    """
+
+    def __init__(
+        self,
+        licence_urls: Iterable[str] = LICENCE_URLS,
+        source_ids: Iterable[str] = LICENSED_SOURCE_IDS,
+    ):
+        self.licence_paths = frozenset(normalise_rights(url) for url in licence_urls)
+        self.source_ids = frozenset(get_source_id(source) for source in source_ids)
+
+    def matches_rights(self, rights: str) -> bool:
+        path = normalise_rights(rights)
+        while path:
+            if path in self.licence_paths:
+                return True
+            path = path.rpartition("/")[0]
+        return False
+
+    def matches_source(self, source: str) -> bool:
+        return get_source_id(source) in self.source_ids
+
+    def is_licensed(self, record: dict) -> bool:
+        return any(
+            self.matches_rights(rights)
+            for rights in record.get("rights") or []
+            if isinstance(rights, str)
+        ) or any(
+            self.matches_source(source)
+            for source in record.get("source") or []
+            if isinstance(source, str)
+        )
+
+    def filter(self, records: Iterable[dict]) -> Iterator[dict]:
+        """
+        Returns:
+            iterator of licensed records
+        """
+        return (record for record in records if self.is_licensed(record))
+
+    def catalogue_mask(self, catalogue: Catalogue) -> int:
+        """
+        Apply the filter to distinct rights and source values of the catalogue instead of every row
+        Returns:
+            bitset of licensed rows
+        """
+        rights = [
+            value for value in catalogue.values("rights") if self.matches_rights(value)
+        ]
+        sources = [
+            value for value in catalogue.values("source") if self.matches_source(value)
+        ]
+        return catalogue.any_of("rights", rights) | catalogue.any_of("source", sources)
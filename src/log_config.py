@@ -0,0 +1,102 @@
+import atexit
+import logging
+import multiprocessing
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+try:
+    from pythonjsonlogger.json import JsonFormatter
+except ImportError:  # python-json-logger < 3.1
+    from pythonjsonlogger.jsonlogger import JsonFormatter
+
+from src.contants import LOGGER_NAME
+
+_listener = None
+_queue_handler = None
+_worker_queue = None
+_worker_listener = None
+
+
+def configure_logging(level: int = logging.INFO, stream=None) -> logging.Logger:
+    """
+    Route all loggers below LOGGER_NAME through a queue to a background thread, which writes
+    JSON lines. Logging calls on the hot path only put the record to the queue, they never
+    wait for a slow stdout/stderr pipe. Configured once per process, later calls return the logger
+    Args:
+        level: minimal level of written records
+        stream: output stream, stderr by default
+    Returns:
+        root logger of the project
+    """
+    global _listener, _queue_handler  # pylint: disable=global-statement
+    logger = logging.getLogger(LOGGER_NAME)
+    if _listener is None:
+        log_queue = queue.SimpleQueue()
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(
+            JsonFormatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+        )
+        _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        _queue_handler = QueueHandler(log_queue)
+        logger.addHandler(_queue_handler)
+        logger.setLevel(level)
+        logger.propagate = False
+        atexit.register(stop_logging)
+    return logger
+
+
+def get_worker_queue() -> multiprocessing.Queue:
+    """
+    Queue for records of worker processes, written by the same handler as records of this process.
+    Pass it to configure_worker_logging in the pool initializer, see pipeline.map_in_processes
+    Returns:
+        multiprocessing queue drained by a listener thread of this process
+    """
+    global _worker_queue, _worker_listener  # pylint: disable=global-statement
+    configure_logging()
+    if _worker_queue is None:
+        _worker_queue = multiprocessing.Queue()
+        _worker_listener = QueueListener(
+            _worker_queue, *_listener.handlers, respect_handler_level=True
+        )
+        _worker_listener.start()
+    return _worker_queue
+
+
+def configure_worker_logging(log_queue: multiprocessing.Queue, level: int) -> None:
+    """
+    Process pool initializer: send records of project loggers to the parent process.
+    A forked worker inherits the parent's queue handler, but not the thread draining its queue,
+    so without this its records are silently lost
+    Args:
+        log_queue: queue returned by get_worker_queue in the parent process
+        level: minimal level of sent records
+    """
+    global _listener, _queue_handler, _worker_queue, _worker_listener  # pylint: disable=global-statement
+    _listener = _queue_handler = _worker_queue = _worker_listener = None
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def stop_logging() -> None:
+    """Write all queued records, also of worker processes, and stop the background threads"""
+    global _listener, _queue_handler, _worker_queue, _worker_listener  # pylint: disable=global-statement
+    if _worker_listener is not None:
+        _worker_listener.stop()
+        _worker_queue.close()
+        _worker_queue.join_thread()
+        _worker_queue = None
+        _worker_listener = None
+    if _listener is None:
+        return
+    _listener.stop()
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.removeHandler(_queue_handler)
+    logger.propagate = True
+    _listener = None
+    _queue_handler = None
@@ -1,14 +1,35 @@
-import ast
+import asyncio
+import hashlib
+import io
+import json
+import logging
 import os
 import sys
-
-import boto3
-import jinja2
-import requests
-from sickle import Sickle
-
-from src import utils
-from src.contants import TEMPLATE_FILE, LOCAL_DIR, BOOK_TEMPLATE
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+from src.contants import (
+    LOCAL_DIR,
+    BOOK_TEMPLATE,
+    OAI_ENDPOINT,
+    RECORDS_FILE,
+    HARVEST_CHECKPOINT_FILE,
+    LOGGER_NAME,
+    OAI_IDENTIFIER_FIELD,
+    ORL_HOST,
+    ORL_MAX_CONNECTIONS,
+    PIPELINE_WORKERS,
+    DOWNLOAD_CHUNK_SIZE,
+    LEDGER_FILE,
+    FINGERPRINT_FIELDS,
+    METADATA_CHUNK_SIZE,
+    METRICS_FILE,
+    STAGE_RENDER_WORKERS,
+    STAGE_DOWNLOAD_WORKERS,
+    STAGE_UPLOAD_WORKERS,
+    STAGE_QUEUE_SIZE,
+    ORL_BASE_URL,
+)
+from src.downloader import download_to_file, download_to_s3
 from src.fields_parser import (
     parse_creator,
     parse_title,
@@ -19,20 +40,51 @@ from src.fields_parser import (
     parse_description,
     parse_publisher,
     parse_date,
-    parse_download_link,
-    parse_book_identifier,
+    classify_identifiers,
+    get_warning_counts,
+    merge_warning_counts,
+    log_warning_summary,
+)
+from src.harvest import harvest_pages
+from src.licence_filter import LicenceFilter
+from src.log_config import (
+    configure_logging,
+    configure_worker_logging,
+    get_worker_queue,
+)
+from src.ledger import DeliveryLedger, METADATA, BOOK, COVER
+from src.metrics import metrics
+from src.onix_batch import OnixBatchWriter
+from src.pipeline import (
+    PipelineStats,
+    iter_chunks,
+    map_in_processes,
+    run_concurrently,
+    run_stages,
 )
+from src.record_store import RecordWriter, compact_records, read_records
+from src.renderer import OnixRenderer, get_renderer
+from src.uploader import S3Uploader
 from src.utils import (
+    HostLimiter,
     generate_product_reference,
-    get_parameter,
-    upload_object_by_path,
     delete_local_file,
 )
 
 file_dir = os.path.dirname(__file__)
 sys.path.append(file_dir)
 
+# limits concurrent downloads from Open Research Library across pipeline workers
+host_limiter = HostLimiter({ORL_HOST: ORL_MAX_CONNECTIONS})
+logger = logging.getLogger(f"{LOGGER_NAME}.main")
 
+# outcomes of metadata delivery, counted per pipeline run
+METADATA_RENDERED = "metadata_rendered"
+METADATA_SKIPPED = "metadata_skipped"
+METADATA_INVALID = "metadata_invalid"
+
+
+@metrics.timed("parse")
 def parse_metadata_record(metadata: dict) -> dict:
     book = BOOK_TEMPLATE.copy()
     book["isbn13"] = parse_isbn(metadata["identifier"])
@@ -63,24 +115,16 @@ def parse_metadata_record(metadata: dict) -> dict:
     return book
 
 
-def render_template(book: dict) -> str:
+def render_template(book: dict, renderer: OnixRenderer = None) -> str:
     """
     Takes book representation, call match OAI and ONIX fields and render jinja2 template, based on results.
     Args:
         book: book from OAI
+        renderer: renderer with compiled template, process-wide renderer by default
     Returns:
-        True if template was successfully rendered, else False
-    """
-    path = os.path.dirname(__file__)
-    template_loader = jinja2.FileSystemLoader(searchpath=path)
-    env = jinja2.Environment(loader=template_loader)
-    template = env.get_template(TEMPLATE_FILE)
-    env.globals[
-        "get_parameter"
-    ] = get_parameter  # map utility function from utils/ to get parameter from nested dict
-
-    header, product = utils.render_book(book)  # call matching excel and onix fields
-    output_text = template.render(header=header, product=product)
+        path to rendered metadata file
+    """
+    output_text = (renderer or get_renderer()).render(book)
     output_file_name = f"{LOCAL_DIR}/{book['isbn13']}.xml"
     with open(output_file_name, "w") as output_file:
         output_file.write(output_text)
@@ -98,127 +142,732 @@ def download_metadata(metadata: dict) -> str:
     return metadata_file_path
 
 
-def download_book_prepare_data(metadata: dict):
-    url = parse_download_link(metadata["identifier"])
-    isbn = parse_isbn(metadata["identifier"])
+def download_book_prepare_data(metadata: dict, assets_base_url: str = ORL_BASE_URL):
+    identifiers = classify_identifiers(metadata["identifier"], assets_base_url)
     book_format = parse_format(metadata["format"])
-    return {"url": url, "isbn": isbn, "book_format": book_format}
+    return {
+        "url": identifiers.download_link,
+        "isbn": identifiers.isbn,
+        "book_format": book_format,
+    }
 
 
-def download_book(prepared_data: dict) -> str:
-    req = requests.get(prepared_data["url"])
-    file_name = f"{prepared_data['isbn']}.{prepared_data['book_format'].lower()}"
-    file_path = f"./books/{file_name}"
-    with open(file_path, "wb") as f:
-        f.write(req.content)
+def get_book_file_name(prepared_data: dict) -> str:
+    return f"{prepared_data['isbn']}.{prepared_data['book_format'].lower()}"
 
-    # Retrieve HTTP meta-data
-    if req.status_code == 200:
-        print(f"Book file {file_name} was successfully downloaded to {file_path}")
-    return file_path
+
+def download_book(
+    prepared_data: dict,
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    digest=None,
+    validators: dict = None,
+) -> str:
+    return download_asset(BOOK_ASSET, prepared_data, chunk_size, digest, validators)
 
 
-def prepare_download_cover_data(metadata: dict) -> dict:
-    book_identifier = parse_book_identifier(metadata["identifier"])
+def prepare_download_cover_data(
+    metadata: dict, assets_base_url: str = ORL_BASE_URL
+) -> dict:
+    identifiers = classify_identifiers(metadata["identifier"], assets_base_url)
+    if not identifiers.viewer_id:
+        raise ValueError(f"Viewer link not found in {metadata['identifier']}")
     return {
-        "url": f"https://openresearchlibrary.org/ext/api/media/{book_identifier}/assets/thumbnail.jpg",
-        "isbn": parse_isbn(metadata["identifier"]),
+        "url": f"{identifiers.assets_url}/thumbnail.jpg",
+        "isbn": identifiers.isbn,
     }
 
 
-def download_cover(prepared_data: dict) -> str:
-    req = requests.get(prepared_data["url"])
-    file_name = f"{prepared_data['isbn']}.jpg"
-    file_path = f"./images/{file_name}"
-    with open(file_path, "wb") as f:
-        f.write(req.content)
+def get_cover_file_name(prepared_data: dict) -> str:
+    return f"{prepared_data['isbn']}.jpg"
+
+
+def download_cover(
+    prepared_data: dict,
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    digest=None,
+    validators: dict = None,
+) -> str:
+    return download_asset(COVER_ASSET, prepared_data, chunk_size, digest, validators)
+
+
+class Asset(NamedTuple):
+    """
+    Book file or cover, delivered next to metadata of every book
+    Attributes:
+        artefact: BOOK or COVER, see ledger
+        directory: local directory of downloaded files
+        prepare: returns download data (url, isbn, ...) of a record, called with the record
+            and the assets base URL
+        get_file_name: returns file name from download data
+    """
+
+    artefact: str
+    directory: str
+    prepare: Callable[[dict, str], dict]
+    get_file_name: Callable[[dict], str]
 
-    # Retrieve HTTP meta-data
-    if req.status_code == 200:
-        print(f"Cover file {file_name} was successfully downloaded to {file_path}")
+
+BOOK_ASSET = Asset(BOOK, "books", download_book_prepare_data, get_book_file_name)
+COVER_ASSET = Asset(COVER, "images", prepare_download_cover_data, get_cover_file_name)
+ASSETS = (BOOK_ASSET, COVER_ASSET)
+
+
+def download_asset(
+    asset: Asset,
+    prepared_data: dict,
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    digest=None,
+    validators: dict = None,
+) -> str:
+    """
+    Returns:
+        path to downloaded file, empty string if validators of previous download are still valid
+    """
+    name = asset.artefact.capitalize()
+    file_name = asset.get_file_name(prepared_data)
+    file_path = f"./{asset.directory}/{file_name}"
+    with host_limiter.limit(prepared_data["url"]):
+        response = download_to_file(
+            prepared_data["url"],
+            file_path,
+            chunk_size,
+            digest=digest,
+            validators=validators,
+        )
+    if response.status_code == 304:
+        print(
+            f"{name} file {file_name} is not modified since last download, skipping..."
+        )
+        return ""
+    print(f"{name} file {file_name} was successfully downloaded to {file_path}")
     return file_path
 
 
-def get_metadata(record: dict, s3) -> None:
+def get_metadata_fingerprint(metadata: dict) -> str:
     """
-    Prepare metadata, download metadata, upload it to S3 and delete local file
+    Stable fingerprint of the OAI fields consumed by parse_metadata_record,
+    if it is unchanged the rendered ONIX product would be unchanged too
+    Returns:
+        sha256 hex digest
     """
-    metadata_file_path = download_metadata(record)
-    metadata_file_name = metadata_file_path.split("/")[-1]
-    upload_object_by_path(
-        s3,
-        s3_path=f"content/open_research_library_iudilif/{metadata_file_name}",
-        local_path=metadata_file_path,
-        bucket_name="plgo-ebooks-bucket",
-    )
-    delete_local_file(metadata_file_path)
+    fields = {field: metadata.get(field) for field in FINGERPRINT_FIELDS}
+    serialized = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
 
 
-def get_book(record: dict, s3) -> None:
+def prepare_metadata_delivery(record: dict, ledger: DeliveryLedger = None) -> dict:
     """
-    Prepare book data, download book, upload it to S3 and delete local file
+    Check if metadata of the record has to be delivered and parse it if so.
+    Records with fingerprint equal to the one of the last delivery are neither parsed nor rendered
+    Returns:
+        delivery dict with outcome (METADATA_RENDERED, METADATA_SKIPPED or METADATA_INVALID),
+        for rendered metadata also book, isbn, artefact and content_hash
     """
-    book_download_data = download_book_prepare_data(metadata=record)
-    book_file_path = download_book(book_download_data)
-    book_file_name = book_file_path.split("/")[-1]
-    upload_object_by_path(
-        s3,
-        s3_path=f"content/open_research_library_iudilif/{book_file_name}",
-        local_path=book_file_path,
-        bucket_name="plgo-ebooks-bucket",
+    isbn = parse_isbn(record["identifier"])
+    if len(isbn) < 2:
+        return dict(outcome=METADATA_INVALID)
+    fingerprint = get_metadata_fingerprint(record)
+    if ledger is not None and ledger.is_delivered(isbn, METADATA, fingerprint):
+        print(f"Metadata of {isbn} is unchanged since last delivery, skipping...")
+        return dict(outcome=METADATA_SKIPPED)
+    return dict(
+        outcome=METADATA_RENDERED,
+        book=parse_metadata_record(record),
+        isbn=isbn,
+        artefact=METADATA,
+        content_hash=fingerprint,
     )
-    delete_local_file(book_file_path)
 
 
-def get_cover(record: dict, s3) -> None:
+def download_metadata_delivery(record: dict, ledger: DeliveryLedger = None) -> dict:
+    """
+    Render metadata to local file, unless it is unchanged since last delivery
+    Returns:
+        delivery dict with outcome, for rendered metadata also isbn, artefact, content_hash and local_path
     """
-    Prepare cover data, download cover, upload it to S3 and delete local file
+    delivery = prepare_metadata_delivery(record, ledger)
+    if delivery["outcome"] == METADATA_RENDERED:
+        delivery["local_path"] = render_template(delivery.pop("book"))
+    return delivery
+
+
+def get_download_validators(
+    url: str,
+    isbn: str,
+    artefact: str,
+    ledger: DeliveryLedger = None,
+    refresh: bool = False,
+) -> Optional[dict]:
+    """
+    Decide how book or cover has to be downloaded
+    Args:
+        url: URL of the artefact
+        isbn: book ISBN
+        artefact: BOOK or COVER
+        ledger: delivery ledger
+        refresh: revalidate already delivered artefact instead of skipping it
+    Returns:
+        None if the book has no valid ISBN to name the artefact after,
+        or if the artefact was already delivered and isn't refreshed,
+        validators of the delivered download for a conditional request if it is refreshed,
+        empty dict for an unconditional download
+    """
+    if not isbn:
+        print(f"{artefact.capitalize()} {url} has no valid ISBN, skipping...")
+        return None
+    if ledger is None or not ledger.is_delivered(isbn, artefact):
+        return {}
+    if not refresh:
+        print(f"{artefact.capitalize()} of {isbn} was already delivered, skipping...")
+        return None
+    return ledger.get_validators(url)
+
+
+def download_asset_delivery(
+    asset: Asset,
+    record: dict,
+    ledger: DeliveryLedger = None,
+    refresh: bool = False,
+    assets_base_url: str = ORL_BASE_URL,
+) -> dict:
+    """
+    Download book file or cover to local file, unless it was already delivered.
+    With refresh delivered asset is downloaded again only if it was modified
+    Returns:
+        delivery dict with isbn, artefact, content_hash, local_path, url and validators or empty dict
     """
-    cover_download_data = prepare_download_cover_data(metadata=record)
-    cover_file_path = download_cover(cover_download_data)
-    cover_file_name = cover_file_path.split("/")[-1]
-    upload_object_by_path(
-        s3,
-        s3_path=f"content/open_research_library_iudilif/{cover_file_name}",
-        local_path=cover_file_path,
-        bucket_name="plgo-ebooks-bucket",
+    download_data = asset.prepare(record, assets_base_url)
+    isbn = download_data["isbn"]
+    url = download_data["url"]
+    validators = get_download_validators(url, isbn, asset.artefact, ledger, refresh)
+    if validators is None:
+        return {}
+    digest = hashlib.sha256()
+    local_path = download_asset(
+        asset, download_data, digest=digest, validators=validators
+    )
+    if not local_path:
+        return {}
+    return dict(
+        isbn=isbn,
+        artefact=asset.artefact,
+        content_hash=digest.hexdigest(),
+        local_path=local_path,
+        url=url,
+        validators=validators,
     )
-    delete_local_file(cover_file_path)
 
 
-def process_books_from_file():
+def upload_deliveries(
+    deliveries: List[dict], uploader: S3Uploader, ledger: DeliveryLedger = None
+) -> None:
+    """
+    Upload local files of deliveries concurrently, delete them and record them
+    with validators of their downloads in the ledger.
+    Local files are deleted even if some uploads failed, the failed ones aren't recorded
+    """
+    deliveries = [delivery for delivery in deliveries if delivery.get("local_path")]
+    try:
+        s3_keys = uploader.upload_many(
+            [delivery["local_path"] for delivery in deliveries], delete_local=True
+        )
+    except Exception:
+        for delivery in deliveries:
+            if os.path.exists(delivery["local_path"]):
+                delete_local_file(delivery["local_path"])
+        raise
+    if ledger is not None:
+        for delivery, s3_key in zip(deliveries, s3_keys):
+            ledger.record(
+                delivery["isbn"], delivery["artefact"], delivery["content_hash"], s3_key
+            )
+            if "validators" in delivery:
+                ledger.record_validators(delivery["url"], delivery["validators"])
+
+
+def get_metadata(
+    record: dict,
+    uploader: S3Uploader,
+    batch_writer: OnixBatchWriter = None,
+    direct: bool = False,
+    ledger: DeliveryLedger = None,
+) -> str:
+    """
+    Prepare metadata, download metadata, upload it to S3 and delete local file.
+    With batch_writer the book is appended to a multi-product ONIX file instead,
+    which is uploaded by the writer once it is complete.
+    With direct=True metadata is rendered in memory and uploaded without local file.
+    With ledger unchanged metadata is skipped and delivered metadata is recorded
+    Returns:
+        METADATA_RENDERED, METADATA_SKIPPED or METADATA_INVALID
+    """
+    if batch_writer is not None:
+        delivery = prepare_metadata_delivery(record, ledger)
+        if delivery["outcome"] != METADATA_RENDERED:
+            return delivery["outcome"]
+
+        def record_delivery(batch_path: str) -> None:
+            s3_key = uploader.get_key(os.path.basename(batch_path))
+            ledger.record(delivery["isbn"], METADATA, delivery["content_hash"], s3_key)
+
+        batch_writer.add(
+            delivery["book"], record_delivery if ledger is not None else None
+        )
+        return delivery["outcome"]
+    if direct:
+        delivery = prepare_metadata_delivery(record, ledger)
+        if delivery["outcome"] == METADATA_RENDERED:
+            output_text = get_renderer().render(delivery["book"])
+            s3_key = uploader.upload_fileobj(
+                io.BytesIO(output_text.encode("utf-8")), f"{delivery['isbn']}.xml"
+            )
+            if ledger is not None:
+                ledger.record(
+                    delivery["isbn"], METADATA, delivery["content_hash"], s3_key
+                )
+        return delivery["outcome"]
+    delivery = download_metadata_delivery(record, ledger)
+    upload_deliveries([delivery], uploader, ledger)
+    return delivery["outcome"]
+
+
+def upload_metadata_file(metadata_file_path: str, uploader: S3Uploader) -> None:
+    try:
+        uploader.upload_file(metadata_file_path)
+    finally:
+        delete_local_file(metadata_file_path)
+
+
+def get_asset(
+    asset: Asset,
+    record: dict,
+    uploader: S3Uploader,
+    direct: bool = False,
+    ledger: DeliveryLedger = None,
+    refresh: bool = False,
+    assets_base_url: str = ORL_BASE_URL,
+) -> None:
+    """
+    Prepare download data of book file or cover, download it, upload it to S3 and delete local file.
+    With direct=True the asset is streamed from HTTP response to S3 without local file.
+    With ledger already delivered asset is skipped and delivered asset is recorded,
+    with refresh delivered asset is revalidated with a conditional request instead
+    """
+    if not direct:
+        upload_deliveries(
+            [download_asset_delivery(asset, record, ledger, refresh, assets_base_url)],
+            uploader,
+            ledger,
+        )
+        return
+    download_data = asset.prepare(record, assets_base_url)
+    isbn = download_data["isbn"]
+    url = download_data["url"]
+    validators = get_download_validators(url, isbn, asset.artefact, ledger, refresh)
+    if validators is None:
+        return
+    digest = hashlib.sha256()
+    with host_limiter.limit(url):
+        s3_key = download_to_s3(
+            url,
+            uploader,
+            asset.get_file_name(download_data),
+            digest=digest,
+            validators=validators,
+        )
+    if not s3_key:
+        print(
+            f"{asset.artefact.capitalize()} of {isbn} is not modified since last download, skipping..."
+        )
+        return
+    if ledger is not None:
+        ledger.record(isbn, asset.artefact, digest.hexdigest(), s3_key)
+        ledger.record_validators(url, validators)
+
+
+def get_book(
+    record: dict,
+    uploader: S3Uploader,
+    direct: bool = False,
+    ledger: DeliveryLedger = None,
+    refresh: bool = False,
+    assets_base_url: str = ORL_BASE_URL,
+) -> None:
+    """Deliver book file of the record, see get_asset"""
+    get_asset(BOOK_ASSET, record, uploader, direct, ledger, refresh, assets_base_url)
+
+
+def get_cover(
+    record: dict,
+    uploader: S3Uploader,
+    direct: bool = False,
+    ledger: DeliveryLedger = None,
+    refresh: bool = False,
+    assets_base_url: str = ORL_BASE_URL,
+) -> None:
+    """Deliver cover of the record, see get_asset"""
+    get_asset(COVER_ASSET, record, uploader, direct, ledger, refresh, assets_base_url)
+
+
+def get_record_files(
+    record: dict,
+    uploader: S3Uploader,
+    batch_writer: OnixBatchWriter = None,
+    ledger: DeliveryLedger = None,
+    refresh: bool = False,
+    assets_base_url: str = ORL_BASE_URL,
+) -> str:
+    """
+    Download metadata, book and cover of the record to local files,
+    then upload them concurrently and delete local files.
+    With ledger already delivered artefacts are skipped,
+    with refresh delivered book and cover are downloaded again only if they were modified
+    Returns:
+        outcome of metadata delivery, see get_metadata
     """
-    Read all records from file and parse them one by one, getting metadata, book and cover for every record
+    deliveries = []
+    try:
+        if batch_writer is not None:
+            outcome = get_metadata(record, uploader, batch_writer, ledger=ledger)
+        else:
+            deliveries.append(download_metadata_delivery(record, ledger))
+            outcome = deliveries[0]["outcome"]
+        for asset in ASSETS:
+            deliveries.append(
+                download_asset_delivery(asset, record, ledger, refresh, assets_base_url)
+            )
+    except Exception:
+        for delivery in deliveries:
+            if delivery.get("local_path"):
+                delete_local_file(delivery["local_path"])
+        raise
+    upload_deliveries(deliveries, uploader, ledger)
+    return outcome
+
+
+def process_books_from_file(
+    records_path: str = RECORDS_FILE,
+    batch_metadata: bool = False,
+    workers: int = PIPELINE_WORKERS,
+    max_in_flight: int = None,
+    direct_upload: bool = False,
+    uploader: S3Uploader = None,
+    ledger_path: str = LEDGER_FILE,
+    refresh: bool = False,
+    metrics_path: str = METRICS_FILE,
+    assets_base_url: str = ORL_BASE_URL,
+):
     """
-    with open(
-        "/home/aviaowl/PycharmProjects/OpenResearchLibraryCOPS/src/output_right.csv"
-    ) as output:
-        lines = output.readlines()
+    Stream all records from the record store and process them concurrently, getting metadata, book and cover for every record
+    Args:
+        records_path: path to record store
+        batch_metadata: write metadata as multi-product ONIX files instead of one file per book
+        workers: number of worker threads
+        max_in_flight: max number of records queued or being processed
+        direct_upload: stream books, covers and metadata to S3 without local files
+        uploader: S3 uploader shared by all workers, uploads to S3_BUCKET/S3_PREFIX by default.
+            A passed uploader is left open, the default one is closed at the end of the run
+        ledger_path: path to delivery ledger, artefacts delivered by previous runs are skipped.
+            None disables the ledger
+        refresh: revalidate delivered books and covers with conditional requests (ETag/Last-Modified)
+            and deliver them again if they were modified, instead of skipping them
+        metrics_path: path of Prometheus text file with metrics of the run, None disables it
+        assets_base_url: host serving books and covers, see fields_parser.classify_identifiers
+    """
+    configure_logging()
+    metrics.reset()
+    owns_uploader = uploader is None
+    uploader = uploader or S3Uploader()
+    ledger = DeliveryLedger(ledger_path) if ledger_path else None
+    batch_writer = (
+        OnixBatchWriter(
+            on_batch_complete=lambda path: upload_metadata_file(path, uploader)
+        )
+        if batch_metadata
+        else None
+    )
 
-    prod = boto3.session.Session(profile_name="prod")
-    s3 = prod.resource("s3")
+    def process_record(record: dict) -> str:
+        if direct_upload:
+            outcome = get_metadata(
+                record, uploader, batch_writer, direct=True, ledger=ledger
+            )
+            for asset in ASSETS:
+                get_asset(
+                    asset,
+                    record,
+                    uploader,
+                    direct=True,
+                    ledger=ledger,
+                    refresh=refresh,
+                    assets_base_url=assets_base_url,
+                )
+            return outcome
+        return get_record_files(
+            record,
+            uploader,
+            batch_writer,
+            ledger=ledger,
+            refresh=refresh,
+            assets_base_url=assets_base_url,
+        )
+
+    books = (
+        record for record in read_records(records_path) if record["type"][0] == "BOOK"
+    )
+    try:
+        stats = run_concurrently(books, process_record, workers, max_in_flight)
+        if batch_writer is not None:
+            batch_writer.close()
+    finally:
+        if ledger is not None:
+            ledger.close()
+        if owns_uploader:
+            uploader.close()
+    print(
+        f"Metadata: {stats.counters[METADATA_RENDERED]} re-rendered, "
+        f"{stats.counters[METADATA_SKIPPED]} skipped as unchanged, "
+        f"{stats.counters[METADATA_INVALID]} without valid ISBN"
+    )
+    log_warning_summary()
+    metrics.log_summary()
+    if metrics_path:
+        metrics.write_prometheus(metrics_path)
+    return stats
 
-    for line in lines:
-        record = ast.literal_eval(line.strip())
-        if record["type"][0] == "BOOK":
-            get_metadata(record, s3)
-            get_book(record, s3)
-            get_cover(record, s3)
+
+def render_products(records: List[dict]) -> Tuple[List[str], dict]:
+    """
+    Parse and render a chunk of records to ONIX Product elements, runs in worker processes.
+    Records without valid ISBN are skipped, failing records are reported and skipped
+    Returns:
+        rendered products, in order of records, and field warning counts of the chunk
+    """
+    renderer = get_renderer()
+    warnings_before = get_warning_counts()
+    products = []
+    for record in records:
+        try:
+            book = parse_metadata_record(record)
+            if len(book["isbn13"]) < 2:
+                continue
+            products.append(renderer.render_product(book))
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning(
+                "failed to render record %s: %s", record.get("identifier"), e
+            )
+    warning_counts = {
+        field: count - warnings_before.get(field, 0)
+        for field, count in get_warning_counts().items()
+    }
+    return products, warning_counts
 
 
-def parse_oai_archive_to_file() -> None:
+def render_metadata_from_file(
+    records_path: str = RECORDS_FILE,
+    workers: int = None,
+    chunk_size: int = METADATA_CHUNK_SIZE,
+    directory: str = LOCAL_DIR,
+    uploader: S3Uploader = None,
+) -> List[str]:
+    """
+    Metadata-only mode: regenerate ONIX metadata of all books in the record store using all CPU cores.
+    Records are sent to worker processes in chunks, rendered products are written to
+    multi-product ONIX files in order of the record store, so output doesn't depend on scheduling.
+    Args:
+        records_path: path to record store
+        workers: number of worker processes, number of CPUs by default
+        chunk_size: number of records sent to a worker process at once
+        directory: local directory for ONIX files
+        uploader: if given, every finished ONIX file is uploaded and deleted
+    Returns:
+        paths of written ONIX files, empty if they were uploaded
     """
-    Get all records from OAI Archive and save them to csv file
+    configure_logging()
+    books = (
+        record for record in read_records(records_path) if record["type"][0] == "BOOK"
+    )
+    on_batch_complete = (
+        (lambda path: upload_metadata_file(path, uploader)) if uploader else None
+    )
+    with OnixBatchWriter(
+        directory=directory, on_batch_complete=on_batch_complete
+    ) as batch_writer:
+        for products, warning_counts in map_in_processes(
+            render_products,
+            iter_chunks(books, chunk_size),
+            workers,
+            initializer=configure_worker_logging,
+            initargs=(get_worker_queue(), logging.getLogger(LOGGER_NAME).level),
+        ):
+            merge_warning_counts(warning_counts)
+            for product in products:
+                batch_writer.add_rendered(product)
+    log_warning_summary()
+    return [] if uploader else batch_writer.completed_files
+
+
+def harvest_books(
+    endpoint: str = OAI_ENDPOINT,
+    output_path: str = RECORDS_FILE,
+    checkpoint_path: str = HARVEST_CHECKPOINT_FILE,
+    filter_licences: bool = True,
+) -> Iterator[List[dict]]:
+    """
+    Incrementally harvest records from OAI Archive and append books to the record store.
+    Only records changed since the last successful harvest are requested,
+    an interrupted harvest resumes from the last saved resumption token.
+    Every page is flushed to disk before it is yielded and before the checkpoint moves past it.
+    Records are stored with their OAI identifier; once the harvest is complete, older versions
+    of re-harvested records are dropped from the store, see record_store.compact_records
+    Args:
+        endpoint: OAI-PMH endpoint
+        output_path: path to record store
+        checkpoint_path: path to harvest checkpoint
+        filter_licences: store only books with distributable licence, see LicenceFilter.
+            False stores all books
+    Returns:
+        iterator over pages, every page is a list of stored books
     """
-    sickle = Sickle("https://catalog.openresearchlibrary.org/oai")
-    records = sickle.ListRecords(metadataPrefix="oai_dc")
-    i = 1
-    with open("output_right.csv", "a") as f1:
-        for record in records:
-            if record.metadata["type"][0] == "BOOK":
+    licence_filter = LicenceFilter() if filter_licences else None
+    i = 0
+    unlicensed = 0
+    with RecordWriter(output_path) as writer:
+        for page in harvest_pages(endpoint, checkpoint_path):
+            books = []
+            for record in page:
+                if record.metadata["type"][0] != "BOOK":
+                    continue
+                if licence_filter is not None and not licence_filter.is_licensed(
+                    record.metadata
+                ):
+                    unlicensed += 1
+                    continue
                 i += 1
                 print(f"{i} book")
-                f1.write(f"{record.metadata}\n")
+                record.metadata[OAI_IDENTIFIER_FIELD] = record.header.identifier
+                writer.write(record.metadata)
+                books.append(record.metadata)
+            writer.flush()
+            yield books
+    print(f"Harvested {i} licensed books, skipped {unlicensed} unlicensed books")
+    if i:
+        dropped = compact_records(output_path)
+        print(f"Dropped {dropped} outdated versions of re-harvested books")
+
+
+def parse_oai_archive_to_file(
+    endpoint: str = OAI_ENDPOINT,
+    output_path: str = RECORDS_FILE,
+    checkpoint_path: str = HARVEST_CHECKPOINT_FILE,
+    filter_licences: bool = True,
+) -> None:
+    """
+    Harvest books to the record store, see harvest_books
+    """
+    for _ in harvest_books(endpoint, output_path, checkpoint_path, filter_licences):
+        pass
+
+
+def harvest_and_process_books(
+    endpoint: str = OAI_ENDPOINT,
+    records_path: str = RECORDS_FILE,
+    checkpoint_path: str = HARVEST_CHECKPOINT_FILE,
+    filter_licences: bool = True,
+    uploader: S3Uploader = None,
+    ledger_path: str = LEDGER_FILE,
+    refresh: bool = False,
+    render_workers: int = STAGE_RENDER_WORKERS,
+    download_workers: int = STAGE_DOWNLOAD_WORKERS,
+    upload_workers: int = STAGE_UPLOAD_WORKERS,
+    queue_size: int = STAGE_QUEUE_SIZE,
+    metrics_path: str = METRICS_FILE,
+    assets_base_url: str = ORL_BASE_URL,
+) -> PipelineStats:
+    """
+    Harvest books and deliver metadata, book and cover of every book while the harvest is running.
+    Harvested pages feed render, download and upload stages through bounded queues
+    (see pipeline.run_stages), so the first books are delivered seconds after the harvest starts
+    and memory use doesn't grow with the catalogue. Harvested books are still appended
+    to the record store, so process_books_from_file can re-run delivery from it.
+    The harvest checkpoint moves past a page once the page is stored, not once its books
+    are delivered, so a later harvest doesn't return books which failed or weren't delivered
+    when the run stopped. After such a run a warning is logged and process_books_from_file
+    has to be re-run over the record store, the ledger skips already delivered artefacts
+    Args:
+        endpoint: OAI-PMH endpoint
+        records_path: path to record store
+        checkpoint_path: path to harvest checkpoint
+        filter_licences: store and deliver only books with distributable licence
+        uploader: S3 uploader shared by all workers, uploads to S3_BUCKET/S3_PREFIX by default.
+            A passed uploader is left open, the default one is closed at the end of the run
+        ledger_path: path to delivery ledger, artefacts delivered by previous runs are skipped.
+            None disables the ledger
+        refresh: revalidate delivered books and covers with conditional requests (ETag/Last-Modified)
+        render_workers: number of records parsed and rendered at once
+        download_workers: number of records whose book and cover are downloaded at once
+        upload_workers: number of files uploaded at once
+        queue_size: max number of records or files waiting between two stages
+        metrics_path: path of Prometheus text file with metrics of the run, None disables it
+        assets_base_url: host serving books and covers, see fields_parser.classify_identifiers
+    Returns:
+        run statistics
+    """
+    configure_logging()
+    metrics.reset()
+    owns_uploader = uploader is None
+    uploader = uploader or S3Uploader()
+    ledger = DeliveryLedger(ledger_path) if ledger_path else None
+
+    def render(record: dict) -> Tuple[str, List[dict]]:
+        delivery = download_metadata_delivery(record, ledger)
+        return delivery["outcome"], [delivery] if delivery.get("local_path") else []
+
+    def download(record: dict) -> List[dict]:
+        deliveries = [
+            download_asset_delivery(asset, record, ledger, refresh, assets_base_url)
+            for asset in ASSETS
+        ]
+        return [delivery for delivery in deliveries if delivery.get("local_path")]
+
+    def upload(delivery: dict) -> None:
+        upload_deliveries([delivery], uploader, ledger)
+
+    stats = None
+    try:
+        stats = asyncio.run(
+            run_stages(
+                harvest_books(endpoint, records_path, checkpoint_path, filter_licences),
+                render,
+                download,
+                upload,
+                render_workers,
+                download_workers,
+                upload_workers,
+                queue_size,
+            )
+        )
+    finally:
+        if ledger is not None:
+            ledger.close()
+        if owns_uploader:
+            uploader.close()
+        if stats is None or stats.failed:
+            logger.warning(
+                "harvest checkpoint is ahead of delivery, re-run process_books_from_file "
+                "with records_path=%r to deliver all harvested books",
+                records_path,
+            )
+    print(
+        f"Metadata: {stats.counters[METADATA_RENDERED]} re-rendered, "
+        f"{stats.counters[METADATA_SKIPPED]} skipped as unchanged, "
+        f"{stats.counters[METADATA_INVALID]} without valid ISBN"
+    )
+    log_warning_summary()
+    metrics.log_summary()
+    if metrics_path:
+        metrics.write_prometheus(metrics_path)
+    return stats
 
 
 if __name__ == "__main__":
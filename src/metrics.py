@@ -0,0 +1,182 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterator, Tuple
+
+from src.contants import LOGGER_NAME, METRICS_BUCKETS, METRICS_PREFIX
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative latency histogram in Prometheus style"""
+
+    def __init__(self, buckets: Tuple[float, ...] = METRICS_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> Iterator[Tuple[str, int]]:
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield ("+Inf" if bound == float("inf") else repr(bound)), total
+
+
+class Metrics:
+    """
+    Thread-safe per-stage metrics of a pipeline run: latency histograms, counters
+    (bytes transferred, errors, ...) and gauges (records/second).
+    Every observation is also logged on DEBUG level, the summary on INFO level,
+    see log_config.configure_logging for JSON output.
+    Examples:
+        with metrics.timer("download"):
+            ...
+        metrics.inc("bytes_total", size, direction="download")
+        metrics.write_prometheus("metrics.prom")
+    """
+
+    def __init__(self, logger: logging.Logger = None):
+        self.logger = logger or logging.getLogger(f"{LOGGER_NAME}.metrics")
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record duration of one stage execution"""
+        key = ("stage_duration_seconds", (("stage", stage),))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+        self.logger.debug("stage", extra={"stage": stage, "seconds": seconds})
+
+    @contextmanager
+    def timer(self, stage: str):
+        """
+        Measure duration of the block as the stage, exceptions are counted in errors_total
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc("errors_total", stage=stage)
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def timed(self, stage: str) -> Callable:
+        """
+        Decorator measuring every call of the function as the stage, see timer
+        """
+
+        def decorator(function: Callable) -> Callable:
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        with self._lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def summary(self) -> dict:
+        """
+        Returns:
+            count, total and mean seconds per stage, counters and gauges, JSON serialisable
+        """
+        with self._lock:
+            stages = {
+                dict(labels)["stage"]: {
+                    "count": histogram.count,
+                    "seconds": round(histogram.sum, 6),
+                    "mean_seconds": round(histogram.sum / histogram.count, 6),
+                }
+                for (_, labels), histogram in self.histograms.items()
+            }
+            counters = {
+                _format_name(name, labels): value
+                for (name, labels), value in self.counters.items()
+            }
+            gauges = {
+                _format_name(name, labels): value
+                for (name, labels), value in self.gauges.items()
+            }
+        return {"stages": stages, "counters": counters, "gauges": gauges}
+
+    def log_summary(self) -> None:
+        self.logger.info("run summary", extra=self.summary())
+
+    def to_prometheus(self) -> str:
+        """
+        Returns:
+            all metrics in Prometheus text exposition format
+        """
+        lines = []
+        with self._lock:
+            for kind, series in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({name for name, _ in series}):
+                    lines.append(f"# TYPE {METRICS_PREFIX}_{name} {kind}")
+                    for (series_name, labels), value in sorted(series.items()):
+                        if series_name == name:
+                            lines.append(f"{_format_name(name, labels)} {value}")
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {METRICS_PREFIX}_{name} histogram")
+                for (series_name, labels), histogram in sorted(self.histograms.items()):
+                    if series_name != name:
+                        continue
+                    for bound, count in histogram.cumulative_counts():
+                        bucket_labels = labels + (("le", bound),)
+                        lines.append(
+                            f"{_format_name(name + '_bucket', bucket_labels)} {count}"
+                        )
+                    lines.append(
+                        f"{_format_name(name + '_sum', labels)} {histogram.sum}"
+                    )
+                    lines.append(
+                        f"{_format_name(name + '_count', labels)} {histogram.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """Dump metrics to a text file, e.g. for node_exporter textfile collector"""
+        with open(path, "w") as metrics_file:
+            metrics_file.write(self.to_prometheus())
+        print(f"Metrics were written to {path}")
+
+
+def _format_name(name: str, labels: Labels) -> str:
+    if not labels:
+        return f"{METRICS_PREFIX}_{name}"
+    formatted = ",".join(f'{key}="{value}"' for key, value in labels)
+    return f"{METRICS_PREFIX}_{name}{{{formatted}}}"
+
+
+# process-wide metrics shared by all pipeline stages
+metrics = Metrics()
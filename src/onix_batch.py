@@ -0,0 +1,136 @@
+import os
+import threading
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from src.contants import (
+    LOCAL_DIR,
+    ONIX_BATCH_MAX_BYTES,
+    ONIX_BATCH_MAX_PRODUCTS,
+    ONIX_MESSAGE_END,
+)
+from src.renderer import OnixRenderer, get_renderer
+
+
+class OnixBatchWriter:
+    """
+    Streams many books as Product elements of one ONIX 3.0 message per file.
+    Every product is written to disk as soon as it is rendered, so memory stays flat.
+    A file is closed and a new one is started when it reaches max_products or max_bytes.
+    The writer is thread-safe, so pipeline workers can share it.
+    Args:
+        directory: local directory for batch files
+        max_products: max number of Product elements in one file
+        max_bytes: max file size in bytes, checked after every product
+        on_batch_complete: called with path of every finished file, e.g. to upload it
+        renderer: renderer with compiled templates, process-wide renderer by default
+    Examples:
+        with OnixBatchWriter(on_batch_complete=upload) as writer:
+            for book in books:
+                writer.add(book)
+    """
+
+    def __init__(
+        self,
+        directory: str = LOCAL_DIR,
+        max_products: int = ONIX_BATCH_MAX_PRODUCTS,
+        max_bytes: int = ONIX_BATCH_MAX_BYTES,
+        on_batch_complete: Callable[[str], None] = None,
+        renderer: OnixRenderer = None,
+    ):
+        self.directory = directory
+        self.max_products = max_products
+        self.max_bytes = max_bytes
+        self.on_batch_complete = on_batch_complete
+        self.renderer = renderer or get_renderer()
+        self.completed_files: List[str] = []
+        self._run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+        self._file = None
+        self._path = ""
+        self._products = 0
+        self._bytes = 0
+        self._on_delivered = []
+        self._lock = threading.Lock()
+
+    def _open_batch(self) -> None:
+        self._path = os.path.join(
+            self.directory,
+            f"onix_{self._run_id}_{len(self.completed_files) + 1:05d}.xml",
+        )
+        self._file = open(self._path, "w", encoding="utf-8")
+        self._write(self.renderer.render_header())
+        self._products = 0
+
+    def _write(self, text: str) -> None:
+        text = f"{text}\n"
+        self._file.write(text)
+        self._bytes += len(text.encode("utf-8"))
+
+    def _close_batch(self) -> Tuple[str, List[Callable[[str], None]]]:
+        """
+        Finish the current file, called with the lock held
+        Returns:
+            path of the finished file and on_delivered callbacks of its books,
+            to be passed to _complete_batch once the lock is released
+        """
+        self._file.write(ONIX_MESSAGE_END)
+        self._file.close()
+        self._file = None
+        self._bytes = 0
+        self.completed_files.append(self._path)
+        print(f"ONIX batch {self._path} with {self._products} products was written")
+        on_delivered, self._on_delivered = self._on_delivered, []
+        return self._path, on_delivered
+
+    def _complete_batch(
+        self, path: str, on_delivered: List[Callable[[str], None]]
+    ) -> None:
+        """Hand finished file to on_batch_complete without the lock, an upload doesn't block add"""
+        if self.on_batch_complete:
+            self.on_batch_complete(path)
+        for callback in on_delivered:
+            callback(path)
+
+    def add(self, book: dict, on_delivered: Callable[[str], None] = None) -> None:
+        """
+        Render book and append it to the current batch
+        Args:
+            book: parsed book, see main.parse_metadata_record
+            on_delivered: called with batch file path once the batch with this book
+                was completed and handled by on_batch_complete
+        """
+        self.add_rendered(self.renderer.render_product(book), on_delivered)
+
+    def add_rendered(
+        self, product: str, on_delivered: Callable[[str], None] = None
+    ) -> None:
+        """
+        Append already rendered Product element to the current batch, see add
+        """
+        completed = None
+        with self._lock:
+            if self._file is None:
+                self._open_batch()
+            self._write(product)
+            self._products += 1
+            if on_delivered:
+                self._on_delivered.append(on_delivered)
+            if self._products >= self.max_products or self._bytes >= self.max_bytes:
+                completed = self._close_batch()
+        if completed is not None:
+            self._complete_batch(*completed)
+
+    def close(self) -> None:
+        """Finish the current batch, if it has any products"""
+        completed = None
+        with self._lock:
+            if self._file is not None:
+                completed = self._close_batch()
+        if completed is not None:
+            self._complete_batch(*completed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
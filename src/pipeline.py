@@ -0,0 +1,311 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from src.contants import (
+    PIPELINE_WORKERS,
+    STAGE_QUEUE_SIZE,
+    STAGE_RENDER_WORKERS,
+    STAGE_DOWNLOAD_WORKERS,
+    STAGE_UPLOAD_WORKERS,
+    LOGGER_NAME,
+)
+from src.metrics import metrics
+
+logger = logging.getLogger(f"{LOGGER_NAME}.pipeline")
+
+
+class PipelineStats:
+    """Thread-safe counters of a pipeline run"""
+
+    def __init__(self):
+        self.processed = 0
+        self.failed = 0
+        self.counters = Counter()
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def record(self, success: bool, outcome: str = None) -> None:
+        with self._lock:
+            if success:
+                self.processed += 1
+            else:
+                self.failed += 1
+            if outcome:
+                self.counters[outcome] += 1
+
+    def finish(self) -> None:
+        self.finished_at = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def books_per_second(self) -> float:
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def report(self) -> str:
+        report = (
+            f"Processed {self.processed} books in {self.elapsed:.1f}s "
+            f"({self.books_per_second:.2f} books/second), {self.failed} failed"
+        )
+        for outcome, count in sorted(self.counters.items()):
+            report += f", {outcome}: {count}"
+        return report
+
+
+def run_concurrently(
+    records: Iterable[dict],
+    handler: Callable[[dict], Optional[str]],
+    workers: int = PIPELINE_WORKERS,
+    max_in_flight: int = None,
+) -> PipelineStats:
+    """
+    Process records with a pool of worker threads.
+    Records are pulled from the iterable lazily: at most max_in_flight records are queued
+    or being processed at any time, so a huge record store never lands in memory.
+    A failing record is reported and counted, it doesn't stop the run.
+    Args:
+        records: iterable of records, e.g. record_store.read_records(...)
+        handler: function processing one record, called from worker threads.
+            If it returns a string, it is counted in stats.counters
+        workers: number of worker threads
+        max_in_flight: max number of submitted but unfinished records, 2 * workers by default
+    Returns:
+        run statistics
+    """
+    stats = PipelineStats()
+    in_flight = threading.BoundedSemaphore(max_in_flight or 2 * workers)
+
+    def process(record: dict) -> None:
+        try:
+            with metrics.timer("record"):
+                outcome = handler(record)
+            stats.record(success=True, outcome=outcome)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning(
+                "failed to process record %s: %s", record.get("identifier"), e
+            )
+            stats.record(success=False)
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for record in records:
+            in_flight.acquire()
+            executor.submit(process, record)
+    stats.finish()
+    metrics.inc("records_total", stats.processed, status="processed")
+    metrics.inc("records_total", stats.failed, status="failed")
+    metrics.set_gauge("records_per_second", stats.books_per_second)
+    logger.info(stats.report())
+    return stats
+
+
+def iter_chunks(items: Iterable, size: int) -> Iterator[List]:
+    """
+    Returns:
+        iterator of lists of up to size consecutive items
+    """
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def map_in_processes(
+    function: Callable,
+    items: Iterable,
+    workers: int = None,
+    max_in_flight: int = None,
+    initializer: Callable = None,
+    initargs: tuple = (),
+) -> Iterator:
+    """
+    Apply function to every item in a pool of worker processes, yielding results in order of items.
+    Like ProcessPoolExecutor.map, but items are submitted lazily, at most max_in_flight at a time,
+    so a huge record store never lands in memory. Pass chunks of records (see iter_chunks)
+    to amortise pickling.
+    Args:
+        function: picklable (module level) function
+        items: iterable of picklable arguments
+        workers: number of worker processes, number of CPUs by default
+        max_in_flight: max number of submitted items without consumed result, 2 * workers by default
+        initializer: picklable function called at start of every worker process,
+            e.g. log_config.configure_worker_logging
+        initargs: arguments of initializer
+    Returns:
+        iterator of results
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=initializer, initargs=initargs
+    ) as executor:
+        futures = deque()
+        for item in items:
+            futures.append(executor.submit(function, item))
+            if len(futures) >= max_in_flight:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+
+
+class _RecordJob:
+    """Record travelling through stages, finished once its last delivery is uploaded"""
+
+    __slots__ = ("record", "outcome", "pending", "failed", "started")
+
+    def __init__(self, record: dict):
+        self.record = record
+        self.outcome = None
+        self.pending = 1
+        self.failed = False
+        self.started = time.perf_counter()
+
+
+async def run_stages(
+    pages: Iterable[List[dict]],
+    render: Callable[[dict], Tuple[Optional[str], List[dict]]],
+    download: Callable[[dict], List[dict]],
+    upload: Callable[[dict], None],
+    render_workers: int = STAGE_RENDER_WORKERS,
+    download_workers: int = STAGE_DOWNLOAD_WORKERS,
+    upload_workers: int = STAGE_UPLOAD_WORKERS,
+    queue_size: int = STAGE_QUEUE_SIZE,
+) -> PipelineStats:
+    """
+    Stream records through render, download and upload stages connected by bounded queues.
+    Every stage has its own number of workers, blocking handlers run in a thread pool.
+    A full queue stops the stage feeding it, so the harvest never runs ahead of delivery
+    by more than queue_size records plus one page, whatever the catalogue size,
+    and delivery of the first books starts as soon as the first page arrives.
+    A failing record is reported and counted, it doesn't stop the run.
+    The next page is requested as soon as the previous one is queued, before its records
+    are delivered.
+    Args:
+        pages: blocking iterable of pages of records, e.g. pages of a running harvest
+        render: function returning metadata outcome and deliveries of the record
+        download: function returning deliveries of the record (book, cover, ...)
+        upload: function uploading one delivery
+        render_workers: number of concurrent render calls
+        download_workers: number of concurrent download calls
+        upload_workers: number of concurrent upload calls
+        queue_size: capacity of every queue between stages
+    Returns:
+        run statistics, a record is processed once all its deliveries are uploaded
+    """
+    loop = asyncio.get_running_loop()
+    stats = PipelineStats()
+    render_queue = asyncio.Queue(queue_size)
+    download_queue = asyncio.Queue(queue_size)
+    upload_queue = asyncio.Queue(queue_size)
+    executor = ThreadPoolExecutor(
+        max_workers=render_workers + download_workers + upload_workers + 1
+    )
+
+    def fail(job: _RecordJob, error: Exception) -> None:
+        logger.warning(
+            "failed to process record %s: %s", job.record.get("identifier"), error
+        )
+        job.failed = True
+
+    def finish(job: _RecordJob) -> None:
+        job.pending -= 1
+        if job.pending:
+            return
+        metrics.observe("record", time.perf_counter() - job.started)
+        if job.failed:
+            metrics.inc("errors_total", stage="record")
+        stats.record(
+            success=not job.failed, outcome=None if job.failed else job.outcome
+        )
+
+    async def put_deliveries(job: _RecordJob, deliveries: List[dict]) -> None:
+        for delivery in deliveries:
+            job.pending += 1
+            await upload_queue.put((job, delivery))
+
+    async def render_worker() -> None:
+        while True:
+            job = await render_queue.get()
+            try:
+                job.outcome, deliveries = await loop.run_in_executor(
+                    executor, render, job.record
+                )
+                await put_deliveries(job, deliveries)
+                job.pending += 1
+                await download_queue.put(job)
+            except asyncio.CancelledError:  # an Exception before python 3.8
+                raise
+            except Exception as e:  # pylint: disable=broad-except
+                fail(job, e)
+            finish(job)
+            render_queue.task_done()
+
+    async def download_worker() -> None:
+        while True:
+            job = await download_queue.get()
+            try:
+                deliveries = await loop.run_in_executor(executor, download, job.record)
+                await put_deliveries(job, deliveries)
+            except asyncio.CancelledError:  # an Exception before python 3.8
+                raise
+            except Exception as e:  # pylint: disable=broad-except
+                fail(job, e)
+            finish(job)
+            download_queue.task_done()
+
+    async def upload_worker() -> None:
+        while True:
+            job, delivery = await upload_queue.get()
+            try:
+                await loop.run_in_executor(executor, upload, delivery)
+            except asyncio.CancelledError:  # an Exception before python 3.8
+                raise
+            except Exception as e:  # pylint: disable=broad-except
+                fail(job, e)
+            finish(job)
+            upload_queue.task_done()
+
+    workers = [
+        asyncio.ensure_future(worker())
+        for worker, count in (
+            (render_worker, render_workers),
+            (download_worker, download_workers),
+            (upload_worker, upload_workers),
+        )
+        for _ in range(count)
+    ]
+    pages = iter(pages)
+    try:
+        while True:
+            page = await loop.run_in_executor(executor, next, pages, None)
+            if page is None:
+                break
+            for record in page:
+                await render_queue.put(_RecordJob(record))
+        for stage_queue in (render_queue, download_queue, upload_queue):
+            await stage_queue.join()
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        # handlers of cancelled workers may still be running, wait for them off the event loop
+        await loop.run_in_executor(None, executor.shutdown)
+    stats.finish()
+    metrics.inc("records_total", stats.processed, status="processed")
+    metrics.inc("records_total", stats.failed, status="failed")
+    metrics.set_gauge("records_per_second", stats.books_per_second)
+    logger.info(stats.report())
+    return stats
@@ -0,0 +1,135 @@
+import ast
+import gzip
+import json
+import os
+import sys
+from typing import Iterable, Iterator
+
+from src.contants import OAI_IDENTIFIER_FIELD
+
+GZIP_SUFFIX = ".gz"
+
+
+def _open(path: str, mode: str):
+    if path.endswith(GZIP_SUFFIX):
+        return gzip.open(path, f"{mode}t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class RecordWriter:
+    """
+    Append OAI metadata records to a JSON Lines record store, one record per line.
+    Paths ending with '.gz' are transparently gzip-compressed.
+    Examples:
+        with RecordWriter("output_right.jsonl") as writer:
+            writer.write({'title': ['Book'], 'type': ['BOOK']})
+    """
+
+    def __init__(self, path: str, append: bool = True):
+        self.path = path
+        self._file = _open(path, "a" if append else "w")
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        self._file.write(f"{line}\n")
+
+    def write_many(self, records: Iterable[dict]) -> int:
+        count = 0
+        for record in records:
+            self.write(record)
+            count += 1
+        return count
+
+    def flush(self) -> None:
+        """Flush buffered records and force them to disk"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_records(path: str) -> Iterator[dict]:
+    """
+    Stream records from a JSON Lines record store in constant memory
+    Args:
+        path: path to record store, '.gz' suffix means gzip-compressed store
+    Returns:
+        iterator over records as dicts
+    """
+    with _open(path, "r") as store:
+        for line in store:
+            if line.strip():
+                yield json.loads(line)
+
+
+def compact_records(path: str, key: str = OAI_IDENTIFIER_FIELD) -> int:
+    """
+    Rewrite the record store keeping only the last occurrence of every record,
+    so records re-harvested by incremental runs replace their older versions.
+    Records without the key (e.g. converted legacy dumps) are all kept.
+    The store is replaced atomically, a crash never leaves a half-written store
+    Args:
+        path: path to record store
+        key: record field identifying the record
+    Returns:
+        number of dropped records
+    """
+    last_rows = {}
+    for row, record in enumerate(read_records(path)):
+        if record.get(key) is not None:
+            last_rows[record[key]] = row
+    keep = set(last_rows.values())
+    dropped = 0
+    tmp_path = (
+        f"{path}.tmp{GZIP_SUFFIX}" if path.endswith(GZIP_SUFFIX) else f"{path}.tmp"
+    )
+    with RecordWriter(tmp_path, append=False) as writer:
+        for row, record in enumerate(read_records(path)):
+            if record.get(key) is not None and row not in keep:
+                dropped += 1
+                continue
+            writer.write(record)
+        writer.flush()
+    os.replace(tmp_path, path)
+    return dropped
+
+
+def read_legacy_dump(path: str) -> Iterator[dict]:
+    """
+    Stream records from the old dump format, where every line is repr() of a record dict
+    Args:
+        path: path to old dump, e.g. output_right.csv
+    Returns:
+        iterator over records as dicts
+    """
+    with open(path, encoding="utf-8") as dump:
+        for line in dump:
+            line = line.strip()
+            if line:
+                yield ast.literal_eval(line)
+
+
+def convert_legacy_dump(legacy_path: str, store_path: str) -> int:
+    """
+    One-shot conversion of an old repr() dump into a record store
+    Args:
+        legacy_path: path to old dump, e.g. output_right.csv
+        store_path: destination record store, e.g. output_right.jsonl or output_right.jsonl.gz
+    Returns:
+        number of converted records
+    """
+    with RecordWriter(store_path, append=False) as writer:
+        count = writer.write_many(read_legacy_dump(legacy_path))
+    print(f"Converted {count} records from {legacy_path} to {store_path}")
+    return count
+
+
+if __name__ == "__main__":
+    convert_legacy_dump(sys.argv[1], sys.argv[2])
@@ -0,0 +1,101 @@
+import os
+
+import jinja2
+
+from src import utils
+from src.contants import TEMPLATE_FILE, HEADER_TEMPLATE_FILE, PRODUCT_TEMPLATE_FILE
+from src.metrics import metrics
+from src.utils import flatten_parameters, get_field, get_parameter
+
+TEMPLATE_DIR = os.path.dirname(__file__)
+
+
+class OnixRenderer:
+    """
+    Loads and compiles the ONIX jinja2 template once and renders books with it.
+    Rendering never touches the filesystem: the compiled template is kept in memory
+    and auto reload is off, so jinja2 doesn't stat the template on every call.
+    Args:
+        template_dir: directory with templates
+        template_file: name of the ONIX message template
+        bytecode_cache_dir: directory for jinja2 bytecode cache, so compiled template
+            survives process restarts. None uses the system temp directory
+        use_bytecode_cache: set to False to compile the template from source on start
+    """
+
+    def __init__(
+        self,
+        template_dir: str = TEMPLATE_DIR,
+        template_file: str = TEMPLATE_FILE,
+        bytecode_cache_dir: str = None,
+        use_bytecode_cache: bool = True,
+    ):
+        bytecode_cache = (
+            jinja2.FileSystemBytecodeCache(bytecode_cache_dir)
+            if use_bytecode_cache
+            else None
+        )
+        self.environment = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(searchpath=template_dir),
+            bytecode_cache=bytecode_cache,
+            auto_reload=False,
+        )
+        # map utility functions from utils/ to get parameter from nested dict or its flat index
+        self.environment.globals["get_parameter"] = get_parameter
+        self.environment.globals["get_field"] = get_field
+        self.template = self.environment.get_template(template_file)
+        self.header_template = self.environment.get_template(HEADER_TEMPLATE_FILE)
+        self.product_template = self.environment.get_template(PRODUCT_TEMPLATE_FILE)
+
+    @metrics.timed("render")
+    def render(self, book: dict) -> str:
+        """
+        Args:
+            book: parsed book, see main.parse_metadata_record
+        Returns:
+            ONIX message for the book
+        """
+        header, product = utils.render_book(book)  # call matching excel and onix fields
+        return self.template.render(
+            header=header,
+            product=product,
+            header_fields=flatten_parameters(header),
+            product_fields=flatten_parameters(product),
+        )
+
+    def render_header(self) -> str:
+        """
+        Returns:
+            XML declaration, opening ONIXMessage tag and Header of a multi-product message
+        """
+        header = utils.render_header()
+        return self.header_template.render(
+            header=header, header_fields=flatten_parameters(header)
+        )
+
+    @metrics.timed("render")
+    def render_product(self, book: dict) -> str:
+        """
+        Args:
+            book: parsed book, see main.parse_metadata_record
+        Returns:
+            single Product element of ONIX message
+        """
+        _, product = utils.render_book(book)
+        return self.product_template.render(
+            product=product, product_fields=flatten_parameters(product)
+        )
+
+
+_default_renderer = None
+
+
+def get_renderer() -> OnixRenderer:
+    """
+    Returns:
+        process-wide renderer, created on first use
+    """
+    global _default_renderer  # pylint: disable=global-statement
+    if _default_renderer is None:
+        _default_renderer = OnixRenderer()
+    return _default_renderer
@@ -0,0 +1,176 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Iterable, List
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+from src.contants import (
+    AWS_PROFILE,
+    S3_BUCKET,
+    S3_PREFIX,
+    S3_MULTIPART_THRESHOLD,
+    S3_MULTIPART_CHUNK_SIZE,
+    S3_MAX_CONCURRENCY,
+    UPLOAD_MAX_WORKERS,
+)
+from src.metrics import metrics
+from src.utils import delete_local_file
+
+
+def create_transfer_config() -> TransferConfig:
+    """
+    Transfer settings for our mix of tiny XML/JPG files and large PDFs:
+    small files go in a single PUT, big books are split into parts uploaded in parallel
+    """
+    return TransferConfig(
+        multipart_threshold=S3_MULTIPART_THRESHOLD,
+        multipart_chunksize=S3_MULTIPART_CHUNK_SIZE,
+        max_concurrency=S3_MAX_CONCURRENCY,
+    )
+
+
+class S3Uploader:
+    """
+    Uploads files to one bucket/prefix, reusing a single thread-safe S3 client
+    Args:
+        bucket_name: name of the destination bucket
+        prefix: key prefix of all uploaded files
+        client: boto3 S3 client, created from AWS profile by default
+        profile_name: AWS profile used to create the client
+        transfer_config: multipart settings, see create_transfer_config
+        max_workers: number of threads uploading files concurrently in upload_many
+        endpoint_url: S3 compatible endpoint, e.g. local moto server, AWS by default
+    Examples:
+        with S3Uploader() as uploader:
+            uploader.upload_many(["books/9780199660797.pdf", "images/9780199660797.jpg"])
+    """
+
+    def __init__(
+        self,
+        bucket_name: str = S3_BUCKET,
+        prefix: str = S3_PREFIX,
+        client=None,
+        profile_name: str = AWS_PROFILE,
+        transfer_config: TransferConfig = None,
+        max_workers: int = UPLOAD_MAX_WORKERS,
+        endpoint_url: str = None,
+    ):
+        self.bucket_name = bucket_name
+        self.prefix = prefix.strip("/")
+        self.transfer_config = transfer_config or create_transfer_config()
+        self.max_workers = max_workers
+        if client is None:
+            session = boto3.session.Session(profile_name=profile_name)
+            pool_size = max_workers + self.transfer_config.max_request_concurrency
+            client = session.client(
+                "s3",
+                endpoint_url=endpoint_url,
+                config=Config(max_pool_connections=pool_size),
+            )
+        self.client = client
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def get_key(self, file_name: str) -> str:
+        return f"{self.prefix}/{file_name}" if self.prefix else file_name
+
+    @metrics.timed("upload")
+    def upload_file(self, local_path: str, file_name: str = None) -> str:
+        """
+        Upload local file
+        Args:
+            local_path: path to local file to upload
+            file_name: destination file name, local file name by default
+        Returns:
+            S3 key of uploaded file
+        Raises:
+            ValueError: in case of problems with file uploading
+        """
+        key = self.get_key(file_name or local_path.split("/")[-1])
+        try:
+            self.client.upload_file(
+                Filename=local_path,
+                Bucket=self.bucket_name,
+                Key=key,
+                Config=self.transfer_config,
+            )
+        except Exception as e:
+            err_msg = f"Failed to upload file: '{key}' to bucket '{self.bucket_name}'.\nDetails: {str(e)}"
+            raise ValueError(err_msg)
+        metrics.inc("bytes_total", os.path.getsize(local_path), direction="upload")
+        print(
+            f"File '{local_path}' was successfully uploaded to bucket '{self.bucket_name}/{key}'"
+        )
+        return key
+
+    @metrics.timed("upload")
+    def upload_fileobj(self, fileobj, file_name: str) -> str:
+        """
+        Upload binary file-like object without touching local disk.
+        Non-seekable streams (e.g. HTTP response body) are sent as multipart upload part by part
+        Args:
+            fileobj: binary file-like object, read until EOF
+            file_name: destination file name
+        Returns:
+            S3 key of uploaded object
+        Raises:
+            ValueError: in case of problems with uploading
+        """
+        key = self.get_key(file_name)
+        try:
+            self.client.upload_fileobj(
+                Fileobj=fileobj,
+                Bucket=self.bucket_name,
+                Key=key,
+                Config=self.transfer_config,
+            )
+        except Exception as e:
+            err_msg = f"Failed to upload file: '{key}' to bucket '{self.bucket_name}'.\nDetails: {str(e)}"
+            raise ValueError(err_msg)
+        print(f"Stream was successfully uploaded to bucket '{self.bucket_name}/{key}'")
+        return key
+
+    def upload_many(
+        self, local_paths: Iterable[str], delete_local: bool = False
+    ) -> List[str]:
+        """
+        Upload many local files concurrently
+        Args:
+            local_paths: paths to local files to upload
+            delete_local: delete every local file after it was uploaded
+        Returns:
+            S3 keys of uploaded files, in order of local_paths
+        Raises:
+            ValueError: if any of files failed to upload, after all uploads finished
+        """
+
+        def upload(local_path: str) -> str:
+            key = self.upload_file(local_path)
+            if delete_local:
+                delete_local_file(local_path)
+            return key
+
+        local_paths = list(local_paths)
+        futures = [self._executor.submit(upload, path) for path in local_paths]
+        wait(futures)
+        errors = [future.exception() for future in futures if future.exception()]
+        if errors:
+            details = "\n".join(str(error) for error in errors)
+            raise ValueError(
+                f"Failed to upload {len(errors)} of {len(local_paths)} files.\nDetails: {details}"
+            )
+        return [future.result() for future in futures]
+
+    def delete(self, file_name: str) -> None:
+        self.client.delete_object(Bucket=self.bucket_name, Key=self.get_key(file_name))
+
+    def close(self) -> None:
+        """Wait for running uploads and stop the upload threads"""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
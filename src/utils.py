@@ -1,17 +1,102 @@
 import os
+import queue
+import re
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from logging import Logger
-from typing import Tuple, List
+from itertools import islice
+from typing import Tuple, List, Dict, Any, Iterable, Iterator
+from urllib.parse import urlparse
 
 import pymysql
 
-from src.contants import ONIX_DATE_FORMAT
+from src.contants import (
+    ONIX_DATE_FORMAT,
+    DB_POOL_SIZE,
+    DB_BULK_CHUNK_SIZE,
+    DB_SELECT_CHUNK_SIZE,
+)
+from src.metrics import metrics
+
+SQL_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class ConnectionPool:
+    """
+    Pool of MySQL connections reused across statements and threads.
+    Connections are created lazily up to size, checked with ping on checkout
+    and reconnected if the server closed them.
+    Args:
+        connection_details: dictionary, required fields: host, username, password, dbname
+        size: max number of open connections
+    Examples:
+        pool = ConnectionPool(connection_details)
+        with pool.connection() as connection:
+            ...
+    """
+
+    def __init__(self, connection_details: dict, size: int = DB_POOL_SIZE):
+        self.connection_details = connection_details
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return initialise_connection(self.connection_details)
+                except Exception:
+                    self._created -= 1
+                    raise
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self):
+        connection = self._acquire()
+        try:
+            connection.ping(reconnect=True)
+            yield connection
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            self._idle.put(connection)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+
+
+@contextmanager
+def _connection(connection_details: dict, pool: ConnectionPool = None):
+    if pool is not None:
+        with pool.connection() as connection:
+            yield connection
+    else:
+        with initialise_connection(connection_details) as connection:
+            yield connection
 
 
 def execute_insert_or_update(
-    statement: str, connection_details: dict, logger: Logger = None
+    statement: str,
+    connection_details: dict,
+    logger: Logger = None,
+    pool: ConnectionPool = None,
 ):
-    with initialise_connection(connection_details) as connection:
+    with _connection(connection_details, pool) as connection:
         with connection.cursor() as cursor:
             cursor.execute(statement)
             row_count = cursor.rowcount
@@ -21,8 +106,13 @@ def execute_insert_or_update(
     return row_count, last_row_id
 
 
-def execute_select(statement: str, connection_details: dict, logger: Logger = None):
-    with initialise_connection(connection_details) as connection:
+def execute_select(
+    statement: str,
+    connection_details: dict,
+    logger: Logger = None,
+    pool: ConnectionPool = None,
+):
+    with _connection(connection_details, pool) as connection:
         if logger:
             logger.debug(f"Executing query: {statement}")
         with connection.cursor(pymysql.cursors.DictCursor) as cursor:
@@ -31,6 +121,94 @@ def execute_select(statement: str, connection_details: dict, logger: Logger = No
     return results
 
 
+def select_in_chunks(
+    query: str,
+    ids: Iterable,
+    connection_details: dict,
+    pool: ConnectionPool = None,
+    chunk_size: int = DB_SELECT_CHUNK_SIZE,
+) -> Iterator[dict]:
+    """
+    Run SELECT ... IN query for arbitrary number of ids, chunk by chunk.
+    Every chunk is a parameterized query executed with a server-side (unbuffered) cursor,
+    so rows are streamed from MySQL one by one instead of being fetched all at once.
+    Args:
+        query: SELECT statement with '{ids}' in place of the IN list
+        ids: iterable of ids, consumed lazily
+        connection_details: dictionary, required fields: host, username, password, dbname
+        pool: connection pool, a new connection is opened if not given
+        chunk_size: max number of ids in one query
+    Returns:
+        iterator over rows as dicts
+    Examples:
+        Input: "SELECT id, language_id FROM meta_data WHERE id IN ({ids})", (2341554, 2341414)
+        Output: {'id': 2341554, 'language_id': 1}, {'id': 2341414, 'language_id': 2}
+    """
+    ids = iter(ids)
+    with _connection(connection_details, pool) as connection:
+        while True:
+            chunk = list(islice(ids, chunk_size))
+            if not chunk:
+                break
+            statement = query.format(ids=", ".join(["%s"] * len(chunk)))
+            with connection.cursor(pymysql.cursors.SSDictCursor) as cursor:
+                cursor.execute(statement, chunk)
+                row = cursor.fetchone()
+                while row is not None:
+                    yield row
+                    row = cursor.fetchone()
+
+
+def execute_bulk_update(
+    table: str,
+    column: str,
+    key_column: str,
+    values: Dict[Any, Any],
+    pool: ConnectionPool,
+    chunk_size: int = DB_BULK_CHUNK_SIZE,
+) -> int:
+    """
+    Update one column of many rows in a single transaction.
+    Every chunk of rows is updated by one parameterized statement:
+    UPDATE table SET column = CASE key_column WHEN %s THEN %s ... END WHERE key_column IN (%s, ...)
+    Args:
+        table: table name
+        column: column to update
+        key_column: column identifying rows, usually primary key
+        values: mapping key -> new value
+        pool: connection pool
+        chunk_size: max number of rows updated by one statement
+    Returns:
+        number of updated rows
+    Raises:
+        ValueError: if table or column names aren't plain SQL identifiers
+    Examples:
+        Input: "meta_data", "language_id", "id", {2341554: 1, 2341414: 2}
+    """
+    for identifier in (table, column, key_column):
+        if not SQL_IDENTIFIER.match(identifier):
+            raise ValueError(f"Wrong SQL identifier: '{identifier}'")
+    items = list(values.items())
+    row_count = 0
+    with pool.connection() as connection:
+        with connection.cursor() as cursor:
+            for start in range(0, len(items), chunk_size):
+                chunk = items[start : start + chunk_size]
+                cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+                placeholders = ", ".join(["%s"] * len(chunk))
+                statement = (
+                    f"UPDATE {table} SET {column} = CASE {key_column} {cases} END "
+                    f"WHERE {key_column} IN ({placeholders})"
+                )
+                params = [param for item in chunk for param in item]
+                params += [key for key, _ in chunk]
+                cursor.execute(statement, params)
+                row_count += cursor.rowcount
+        connection.commit()
+    print(f"Bulk update of {table}.{column}: {row_count} of {len(items)} rows changed")
+    return row_count
+
+
 def initialise_connection(connection_details: dict):
     """
     Create a connection to MySQL database instance
@@ -50,30 +228,43 @@ def initialise_connection(connection_details: dict):
     return cnx
 
 
-def upload_object_by_path(s3, bucket_name: str, local_path: str, s3_path: str) -> None:
+class HostLimiter:
     """
-    Upload local file to AWS S3 Bucket
+    Limits number of concurrent requests per host
     Args:
-        s3: instance of boto3.resource
-        bucket_name: name of the destination bucket
-        s3_path: bucket destination file + destination file name
-        local_path: path to local file to upload
-    Returns:
-        None
-    Raises:
-        FileUploadFailed: general exception in case of problems with file uploading
+        limits: max concurrent requests for specific hosts, e.g. {'openresearchlibrary.org': 4}
+        default_limit: limit for other hosts, None means unlimited
+    Examples:
+        with host_limiter.limit(url):
+            requests.get(url)
     """
-    try:
-        bucket = s3.Bucket(bucket_name)
-        bucket.upload_file(Filename=local_path, Key=s3_path)
-    except Exception as e:
-        err_msg = f"Failed to upload file: '{s3_path}' to bucket '{bucket_name}'.\nDetails: {str(e)}"
-        raise ValueError(err_msg)
-    print(
-        f"File '{local_path}' was successfully uploaded to bucket '{bucket_name}/{s3_path}'"
-    )
+
+    def __init__(self, limits: dict = None, default_limit: int = None):
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, host: str):
+        with self._lock:
+            if host not in self._semaphores:
+                limit = self.limits.get(host, self.default_limit)
+                self._semaphores[host] = (
+                    threading.BoundedSemaphore(limit) if limit else None
+                )
+            return self._semaphores[host]
+
+    @contextmanager
+    def limit(self, url: str):
+        semaphore = self._semaphore(urlparse(url).netloc)
+        if semaphore is None:
+            yield
+            return
+        with semaphore:
+            yield
 
 
+@metrics.timed("delete")
 def delete_local_file(file_name: str) -> None:
     """
     Delete the given local file.
@@ -152,6 +343,54 @@ def get_parameter(parameter: dict, key: str, default: str) -> str:
     return default
 
 
+def flatten_parameters(parameter: dict) -> dict:
+    """Build flat index of a nested dictionary, so every key is found in O(1)
+    Lookups in the index return exactly what get_key_from_dict_recursively returns:
+    own keys of the dict win (even if empty), otherwise the first non-empty value
+    found by depth-first walk of nested dicts in insertion order.
+    Args:
+        parameter: nested dictionary
+    Returns:
+        flat dictionary key -> value
+    Examples:
+        Input: {'a': {'b': '', 'c': '1'}, 'd': {'b': '2'}}
+        Output: {'a': {...}, 'd': {...}, 'b': '2', 'c': '1'}
+    """
+    index = dict(parameter)
+    for value in parameter.values():
+        if isinstance(value, dict):
+            for key, nested_value in flatten_parameters(value).items():
+                if key not in index and nested_value and nested_value != "":
+                    index[key] = nested_value
+    return index
+
+
+def get_field(fields: dict, key: str, default: str) -> str:
+    """Get value from the flat index built by flatten_parameters
+    Args:
+        fields: flat index of the nested dictionary
+        key: key to search
+        default: default value if key not found
+    Returns:
+        same value as get_parameter would return for the nested dictionary
+    """
+    value = fields.get(key)
+    if value is not None:
+        return value
+    return default
+
+
+def render_header() -> dict:
+    """
+    Returns:
+        header fields of ONIX message
+    Examples:
+        output >> {'sent_date_time': '20200809'}
+    """
+    today = datetime.today().date().strftime(ONIX_DATE_FORMAT)
+    return dict(sent_date_time=today)
+
+
 def render_book(book: dict) -> Tuple[dict, dict]:  # pylint: disable=too-many-locals
     """
     Takes validated book and match book fields with fields of jinja2 template, repeat xml structure
@@ -165,9 +404,7 @@ def render_book(book: dict) -> Tuple[dict, dict]:  # pylint: disable=too-many-lo
     Returns:
         rendered header and product of the book
     """
-    # header part
-    today = datetime.today().date().strftime(ONIX_DATE_FORMAT)
-    header = dict(sent_date_time=today)
+    header = render_header()
 
     # product part
     product_identifier = dict(product_id_value=book["isbn13"])
@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import boto3
+import pytest
+
+try:
+    from moto import mock_aws
+except ImportError:  # moto < 5, the last releases for python 3.7
+    from moto import mock_s3 as mock_aws
+
+from src.contants import LOGGER_NAME
+from src.fields_parser import reset_warning_counts
+from src.log_config import stop_logging
+from src.uploader import S3Uploader
+
+
+@pytest.fixture(autouse=True)
+def isolated_logging():
+    """
+    Every test starts and ends with unconfigured project logging (see log_config),
+    no counted field warnings and no handlers or level left behind on project loggers
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    handlers = list(logger.handlers)
+    level = logger.level
+    stop_logging()
+    reset_warning_counts()
+    yield
+    stop_logging()
+    reset_warning_counts()
+    for handler in list(logger.handlers):
+        if handler not in handlers:
+            logger.removeHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = True
+
+
+class FileServer(ThreadingHTTPServer):
+    """
+    Local stand-in for openresearchlibrary.org.
+    Serves routes {path: body}, {path: (status, body, headers)} or {path: callable returning
+    such tuple} and records every request, client connections and peak concurrency.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FileRequestHandler)
+        self.routes = {}
+        self.delay = 0.0
+        self.requests = []
+        self.client_ports = set()
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+
+
+class FileRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        server = self.server
+        with server._lock:
+            server.requests.append((self.path, dict(self.headers)))
+            server.client_ports.add(self.client_address[1])
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(server.delay)
+            route = server.routes.get(self.path)
+            if route is None:
+                route = (404, b"not found", {})
+            elif isinstance(route, bytes):
+                route = (200, route, {})
+            elif callable(route):
+                route = route(self)
+            status, body, headers = route
+            self.send_response(status)
+            headers = dict(headers)
+            headers.setdefault("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server._lock:
+                server.active -= 1
+
+
+@pytest.fixture
+def file_server():
+    server = FileServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def uploader():
+    """S3Uploader of an empty moto bucket 'test-bucket', uploading under 'orl/'"""
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="test-bucket")
+        with S3Uploader(
+            bucket_name="test-bucket", prefix="orl", client=client
+        ) as uploader:
+            yield uploader
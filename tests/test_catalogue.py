@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from src.catalogue import Catalogue, load_catalogue, select_records
+from src.record_store import read_records
+
+RECORDS_PATH = os.path.join(os.path.dirname(__file__), "data", "oai_records.jsonl")
+CC_BY = "https://creativecommons.org/licenses/by/4.0/legalcode"
+PUBLIC_DOMAIN = "https://wiki.creativecommons.org/wiki/public_domain"
+
+
+def is_licensed(record: dict) -> bool:
+    return record["type"][0] == "BOOK" and (
+        CC_BY in record["rights"] or PUBLIC_DOMAIN in record["rights"]
+    )
+
+
+def test_catalogue_filters_like_record_scan():
+    catalogue = load_catalogue(RECORDS_PATH)
+    records = list(read_records(RECORDS_PATH))
+
+    licensed = catalogue.mask("type", "BOOK") & catalogue.any_of(
+        "rights", [CC_BY, PUBLIC_DOMAIN]
+    )
+
+    assert len(catalogue) == len(records)
+    assert list(select_records(RECORDS_PATH, licensed)) == [
+        record for record in records if is_licensed(record)
+    ]
+    assert catalogue.count(licensed) == len(catalogue.isbns(licensed))
+    assert catalogue.mask("rights", "unknown") == 0
+    assert list(select_records(RECORDS_PATH, 0)) == []
+
+
+@pytest.mark.parametrize(
+    "mask, expected_rows", [(0, []), (0b1, [0]), (0b101000, [3, 5]), (1 << 70, [70])]
+)
+def test_catalogue_rows(mask, expected_rows):
+    assert Catalogue.rows(mask) == expected_rows
+
+
+def test_catalogue_masks_follow_added_rows():
+    catalogue = Catalogue(columns=("type", "rights"))
+    for i in range(1000):
+        catalogue.add(
+            {
+                "identifier": [f"ISBN:{i}"],
+                "type": ["BOOK" if i % 3 else "ARTICLE"],
+                "rights": [CC_BY if i % 2 else "All rights reserved"],
+            }
+        )
+    licensed = catalogue.mask("type", "BOOK") & catalogue.mask("rights", CC_BY)
+    assert catalogue.rows(licensed) == [i for i in range(1000) if i % 3 and i % 2]
+
+    catalogue.add({"type": ["BOOK"], "rights": [CC_BY]})
+    assert catalogue.rows(catalogue.mask("rights", CC_BY))[-1] == 1000
+
+
+def test_catalogue_type_matches_first_value_only():
+    catalogue = Catalogue(columns=("type", "rights"))
+    catalogue.add({"type": ["ARTICLE", "BOOK"], "rights": [PUBLIC_DOMAIN, CC_BY]})
+    catalogue.add({"type": ["BOOK", "ARTICLE"], "rights": [CC_BY]})
+
+    assert catalogue.rows(catalogue.mask("type", "BOOK")) == [1]
+    assert catalogue.rows(catalogue.mask("rights", CC_BY)) == [0, 1]
@@ -0,0 +1,172 @@
+import io
+import os
+
+import pytest
+import requests
+import urllib3
+
+from src import main
+from src.downloader import create_session, download_to_file, download_to_s3
+from src.record_store import read_records
+
+RECORDS_PATH = os.path.join(os.path.dirname(__file__), "data", "oai_records.jsonl")
+
+
+def test_download_to_file_streams_in_chunks(tmp_path, file_server):
+    body = os.urandom(300_000)
+    file_server.routes["/book.pdf"] = body
+    file_path = str(tmp_path / "book.pdf")
+
+    response = download_to_file(
+        file_server.url("/book.pdf"), file_path, chunk_size=1024
+    )
+
+    assert response.status_code == 200
+    with open(file_path, "rb") as f:
+        assert f.read() == body
+    assert os.listdir(tmp_path) == ["book.pdf"]
+
+
+def test_download_to_file_keeps_no_partial_file(tmp_path, file_server):
+    file_server.routes["/book.pdf"] = (
+        200,
+        b"truncated",
+        {"Content-Length": "1000", "Connection": "close"},
+    )
+    file_path = str(tmp_path / "book.pdf")
+
+    with pytest.raises((ValueError, requests.RequestException)):
+        download_to_file(file_server.url("/book.pdf"), file_path)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_download_to_file_reuses_connection(tmp_path, file_server):
+    session = create_session()
+    for number in range(5):
+        file_server.routes[f"/{number}.jpg"] = b"cover"
+        download_to_file(
+            file_server.url(f"/{number}.jpg"),
+            str(tmp_path / f"{number}.jpg"),
+            session=session,
+        )
+    assert len(file_server.client_ports) == 1
+
+
+def test_download_to_file_retries_with_retry_after(tmp_path, file_server):
+    responses = [
+        (503, b"busy", {"Retry-After": "0"}),
+        (500, b"error", {}),
+        (200, b"cover", {}),
+    ]
+    file_server.routes["/cover.jpg"] = lambda handler: responses.pop(0)
+    file_path = str(tmp_path / "cover.jpg")
+
+    download_to_file(
+        file_server.url("/cover.jpg"),
+        file_path,
+        session=create_session(backoff_factor=0),
+    )
+
+    assert len(file_server.requests) == 3
+    with open(file_path, "rb") as f:
+        assert f.read() == b"cover"
+
+
+def test_download_to_file_fails_on_error_status(tmp_path, file_server):
+    session = create_session(max_retries=1, backoff_factor=0)
+    with pytest.raises(ValueError, match="HTTP 404"):
+        download_to_file(
+            file_server.url("/missing.pdf"), str(tmp_path / "book.pdf"), session=session
+        )
+    assert os.listdir(tmp_path) == []
+
+
+def test_download_to_s3_uses_multipart_upload(uploader, file_server):
+    body = os.urandom(17 * 1024 * 1024)  # above 16MB multipart threshold
+    file_server.routes["/book.pdf"] = body
+
+    download_to_s3(file_server.url("/book.pdf"), uploader, "book.pdf")
+
+    uploaded = uploader.client.get_object(Bucket="test-bucket", Key="orl/book.pdf")
+    assert uploaded["Body"].read() == body
+    assert "-" in uploaded["ETag"]  # multipart ETag has "-<number of parts>" suffix
+
+
+class TruncatingSession:
+    """Session returning a body shorter than its Content-Length without raising, like urllib3 1.x"""
+
+    def __init__(self, body: bytes, content_length: int):
+        self.body = body
+        self.content_length = content_length
+
+    def get(self, url, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers["Content-Length"] = str(self.content_length)
+        response.raw = urllib3.HTTPResponse(
+            body=io.BytesIO(self.body),
+            preload_content=False,
+            enforce_content_length=False,
+        )
+        return response
+
+
+@pytest.mark.parametrize("size", [9, 17 * 1024 * 1024])
+def test_download_to_s3_keeps_existing_object_on_incomplete_download(uploader, size):
+    uploader.client.put_object(Bucket="test-bucket", Key="orl/book.pdf", Body=b"good")
+    session = TruncatingSession(os.urandom(size), size + 1000)
+
+    with pytest.raises(ValueError, match="Incomplete download"):
+        download_to_s3("http://orl/book.pdf", uploader, "book.pdf", session=session)
+
+    uploaded = uploader.client.get_object(Bucket="test-bucket", Key="orl/book.pdf")
+    assert uploaded["Body"].read() == b"good"
+    uploads = uploader.client.list_multipart_uploads(Bucket="test-bucket")
+    assert not uploads.get("Uploads")
+
+
+def test_get_metadata_direct_upload(uploader, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    record = next(read_records(RECORDS_PATH))
+
+    main.get_metadata(record, uploader, direct=True)
+
+    uploaded = uploader.client.get_object(
+        Bucket="test-bucket", Key="orl/9780199660797.xml"
+    )
+    assert "<IDValue>9780199660797</IDValue>" in uploaded["Body"].read().decode()
+    assert os.listdir(tmp_path) == []
+
+
+def test_download_to_file_revalidates_with_validators(tmp_path, file_server):
+    def cover(handler):
+        if handler.headers.get("If-None-Match") == '"v1"':
+            return 304, b"", {"ETag": '"v1"'}
+        return 200, b"cover", {"ETag": '"v1"', "Last-Modified": "Mon, 05 Oct 2026"}
+
+    file_server.routes["/cover.jpg"] = cover
+    file_path = str(tmp_path / "cover.jpg")
+    validators = {}
+
+    response = download_to_file(
+        file_server.url("/cover.jpg"), file_path, validators=validators
+    )
+    assert response.status_code == 200
+    assert validators == {
+        "etag": '"v1"',
+        "last_modified": "Mon, 05 Oct 2026",
+        "content_length": 5,
+    }
+    os.remove(file_path)
+
+    response = download_to_file(
+        file_server.url("/cover.jpg"), file_path, validators=validators
+    )
+    assert response.status_code == 304
+    assert not os.path.exists(file_path)
+    assert file_server.requests[1][1]["If-Modified-Since"] == "Mon, 05 Oct 2026"
+    file_server.routes["/cover.jpg"] = (304, b"", {})
+    with pytest.raises(ValueError):
+        download_to_file(file_server.url("/cover.jpg"), file_path)
@@ -1,6 +1,12 @@
+import logging
+
+import dateutil.parser as date_parser
 import pytest
 
+from src.contants import FIELD_WARNING_LOG_LIMIT
 from src.fields_parser import (
+    get_warning_counts,
+    classify_identifiers,
     parse_creator,
     parse_date,
     parse_description,
@@ -47,6 +53,33 @@ def test_parse_date(raw_date, expected_date):
     assert parse_date(raw_date) == expected_date
 
 
+@pytest.mark.parametrize(
+    "raw_date",
+    [
+        "2013-01-01T00:00:00Z",
+        "2013-12-31T23:59:59.999Z",
+        "2013-01-01 10:00",
+        "2013-01-01",
+        "2013-01-01T00:00:00+02:00",
+        "20131231",
+        "2013",
+        "2012",
+        "May 2013",
+        "2013-02-30",
+        "2013-01-01T24:00:00Z",
+    ],
+)
+def test_parse_date_matches_dateutil(raw_date):
+    try:
+        expected_date = date_parser.parse(raw_date).strftime("%Y%m%d")
+    except ValueError:
+        with pytest.raises(ValueError):
+            parse_date([raw_date])
+        return
+    assert parse_date([raw_date]) == expected_date
+    assert parse_date([raw_date]) == expected_date
+
+
 @pytest.mark.parametrize(
     "raw_description, expected_description",
     [(["Winter is coming"], "Winter is coming"), (None, ""), ([], ""), ([""], "")],
@@ -96,6 +129,78 @@ def test_parse_isbn(raw_identifier, expected_isbn):
     assert parse_isbn(raw_identifier) == expected_isbn
 
 
+@pytest.mark.parametrize(
+    "raw_identifier, expected_isbn",
+    [
+        (["ISBN:9780199660797"], "9780199660797"),
+        (["ISBN:9780199660798"], ""),
+        (["ISBN:9790199660797"], ""),
+        (["ISBN:978019966079X"], ""),
+        (["ISBN:9780199660797", "ISBN:9783110412574"], ""),
+    ],
+)
+def test_parse_isbn_validates_checksum(raw_identifier, expected_isbn):
+    assert parse_isbn(raw_identifier) == expected_isbn
+
+
+def test_classify_identifiers():
+    raw_identifier = [
+        "https://openresearchlibrary.org/viewer/9fa24158-ec43-4b6f-9c99-f8edd0e5b260",
+        "ISBN:9780199660797",
+        "DOI:https://dx.doi.org/10.1093/acprof:oso/9780199660797.001.0001",
+    ]
+
+    identifiers = classify_identifiers(raw_identifier)
+
+    assert identifiers.isbn == "9780199660797"
+    assert identifiers.doi == "10.1093/acprof:oso/9780199660797.001.0001"
+    assert identifiers.viewer_id == "9fa24158-ec43-4b6f-9c99-f8edd0e5b260"
+    assert identifiers.download_link == (
+        "https://openresearchlibrary.org/ext/api/media/"
+        "9fa24158-ec43-4b6f-9c99-f8edd0e5b260/assets/external_content.pdf"
+    )
+    assert classify_identifiers(list(raw_identifier)) is identifiers
+    assert classify_identifiers(None).isbn == ""
+    with pytest.raises(AttributeError):
+        identifiers.isbn = "9783110412574"
+
+
+@pytest.mark.parametrize(
+    "assets_base_url, expected_assets_url",
+    [
+        (None, "https://openresearchlibrary.org/ext/api/media/90626a3e/assets"),
+        (
+            "http://127.0.0.1:8000",
+            "http://127.0.0.1:8000/ext/api/media/90626a3e/assets",
+        ),
+    ],
+)
+def test_classify_identifiers_uses_assets_base_url(
+    assets_base_url, expected_assets_url
+):
+    raw_identifier = ["https://mirror.example.org/viewer/90626a3e"]
+
+    if assets_base_url is None:
+        identifiers = classify_identifiers(raw_identifier)
+    else:
+        identifiers = classify_identifiers(raw_identifier, assets_base_url)
+
+    assert identifiers.assets_url == expected_assets_url
+    assert identifiers.download_link == f"{expected_assets_url}/external_content.pdf"
+
+
+def test_parse_isbn_counts_isbn_warnings_of_memoised_calls():
+    raw_identifier = ["ISBN:9780199660797", "ISBN:9783110412574"]
+
+    for _ in range(3):
+        assert classify_identifiers(raw_identifier).isbn == ""
+    assert get_warning_counts() == {}
+
+    for _ in range(3):
+        assert parse_isbn(raw_identifier) == ""
+    assert get_warning_counts() == {"isbn": 3}
+
+
 @pytest.mark.parametrize(
     "raw_identifier, expected_link",
     [
@@ -179,3 +284,19 @@ def test_parse_subject(raw_subject, expected_bisacs):
 )
 def test_parse_title(raw_title, expected_title):
     assert parse_title(raw_title) == expected_title
+
+
+def test_repeated_warnings_are_counted_not_logged(caplog):
+    with caplog.at_level(logging.WARNING, logger="orl"):
+        for _ in range(FIELD_WARNING_LOG_LIMIT + 5):
+            parse_title(None)
+        parse_publisher([])
+
+    assert get_warning_counts() == {
+        "title": FIELD_WARNING_LOG_LIMIT + 5,
+        "publisher": 1,
+    }
+    parser_records = [
+        record for record in caplog.records if record.name == "orl.fields_parser"
+    ]
+    assert len(parser_records) == FIELD_WARNING_LOG_LIMIT + 1
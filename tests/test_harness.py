@@ -0,0 +1,27 @@
+import json
+
+import pytest
+
+from benchmarks.harness import run_pipeline
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_run_pipeline_delivers_harvested_books_offline(tmp_path, streaming):
+    stats = run_pipeline(
+        record_count=12,
+        workers=4,
+        error_rate=0.1,
+        work_dir=str(tmp_path),
+        page_size=5,
+        streaming=streaming,
+    )
+    with open(tmp_path / "records.jsonl") as records_file:
+        harvested = [json.loads(line) for line in records_file]
+    with open(tmp_path / "checkpoint.json") as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+
+    assert harvested
+    assert checkpoint["resumption_token"] is None
+    assert stats.processed == len(harvested)
+    assert stats.failed == 0
+    assert (tmp_path / "metrics.prom").exists()
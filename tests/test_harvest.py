@@ -0,0 +1,88 @@
+import json
+
+import pytest
+from sickle import Sickle
+from sickle.response import OAIResponse
+
+from src.harvest import harvest_pages, load_checkpoint
+
+PAGE = """<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">
+  <ListRecords>
+    <record>
+      <header><identifier>oai:orl:{number}</identifier><datestamp>2021-01-01</datestamp></header>
+      <metadata>
+        <oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/"
+                   xmlns:dc="http://purl.org/dc/elements/1.1/">
+          <dc:title>Book {number}</dc:title>
+          <dc:type>BOOK</dc:type>
+        </oai_dc:dc>
+      </metadata>
+    </record>
+    <record>
+      <header status="deleted"><identifier>oai:orl:deleted</identifier><datestamp>2021-01-01</datestamp></header>
+    </record>
+    {token}
+  </ListRecords>
+</OAI-PMH>"""
+
+
+class FakeHttpResponse:
+    def __init__(self, content: str):
+        self.content = content.encode()
+        self.text = content
+
+
+@pytest.fixture
+def oai_requests(monkeypatch):
+    """Serve two pages linked by a resumption token and record every request"""
+    pages = {
+        None: PAGE.format(number=1, token="<resumptionToken>page2</resumptionToken>"),
+        "page2": PAGE.format(number=2, token="<resumptionToken/>"),
+    }
+    requests = []
+
+    def harvest(sickle, **kwargs):
+        requests.append(kwargs)
+        return OAIResponse(
+            FakeHttpResponse(pages[kwargs.get("resumptionToken")]), kwargs
+        )
+
+    monkeypatch.setattr(Sickle, "harvest", harvest)
+    return requests
+
+
+def test_harvest_pages_full_run(tmp_path, oai_requests):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    pages = list(harvest_pages("http://oai.test", checkpoint_path))
+
+    assert [[r.metadata["title"] for r in page] for page in pages] == [
+        [["Book 1"]],
+        [["Book 2"]],
+    ]
+    assert "from" not in oai_requests[0]
+    checkpoint = load_checkpoint(checkpoint_path)
+    assert checkpoint["resumption_token"] is None
+    assert checkpoint["from"] is not None
+
+
+def test_harvest_pages_resumes_after_crash(tmp_path, oai_requests):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    pages = harvest_pages("http://oai.test", checkpoint_path)
+    next(pages)
+    next(pages)  # second page is fetched only after the first one was persisted
+    pages.close()  # crash while processing the second page
+
+    assert load_checkpoint(checkpoint_path)["resumption_token"] == "page2"
+    resumed = list(harvest_pages("http://oai.test", checkpoint_path))
+    assert [[r.metadata["title"] for r in page] for page in resumed] == [[["Book 2"]]]
+    assert oai_requests[-1]["resumptionToken"] == "page2"
+
+
+def test_harvest_pages_incremental_run(tmp_path, oai_requests):
+    checkpoint_path = tmp_path / "checkpoint.json"
+    checkpoint_path.write_text(json.dumps({"from": "2021-01-01"}))
+    list(harvest_pages("http://oai.test", str(checkpoint_path)))
+
+    assert oai_requests[0]["from"] == "2021-01-01"
+    assert oai_requests[0]["metadataPrefix"] == "oai_dc"
@@ -0,0 +1,183 @@
+import os
+
+import pytest
+
+from src import main
+from src.fields_parser import get_warning_counts
+from src.ledger import BOOK, METADATA, DeliveryLedger
+from src.record_store import read_records
+
+RECORDS_PATH = os.path.join(os.path.dirname(__file__), "data", "oai_records.jsonl")
+
+
+def test_ledger_round_trip(tmp_path):
+    path = str(tmp_path / "ledger.sqlite")
+    with DeliveryLedger(path) as ledger:
+        assert not ledger.is_delivered("9780199660797", BOOK)
+        ledger.record("9780199660797", BOOK, "hash", "orl/9780199660797.pdf")
+
+    with DeliveryLedger(path) as ledger:
+        assert ledger.is_delivered("9780199660797", BOOK)
+        assert ledger.is_delivered("9780199660797", BOOK, "hash")
+        assert not ledger.is_delivered("9780199660797", BOOK, "other hash")
+        assert not ledger.is_delivered("9780199660797", METADATA)
+        assert ledger.get("9780199660797", BOOK)["s3_key"] == "orl/9780199660797.pdf"
+        assert not ledger.is_delivered("", BOOK)
+
+
+def test_rerun_skips_delivered_artefacts(tmp_path, monkeypatch, file_server, uploader):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("books")
+    os.mkdir("metadata")
+    record = next(read_records(RECORDS_PATH))
+    record["identifier"][1] = file_server.url("/external_content.pdf")
+    file_server.routes["/external_content.pdf"] = b"book"
+    ledger = DeliveryLedger(":memory:")
+
+    for _ in range(2):
+        main.get_metadata(record, uploader, ledger=ledger)
+        main.get_book(record, uploader, ledger=ledger)
+
+    assert len(file_server.requests) == 1
+    assert ledger.get("9780199660797", BOOK)["s3_key"] == "orl/9780199660797.pdf"
+    assert ledger.is_delivered("9780199660797", METADATA)
+    assert os.listdir("books") + os.listdir("metadata") == []
+
+    record["title"] = ["New title"]
+    main.get_metadata(record, uploader, ledger=ledger)
+    metadata = uploader.client.get_object(
+        Bucket="test-bucket", Key="orl/9780199660797.xml"
+    )
+    assert "New title" in metadata["Body"].read().decode()
+
+
+def test_unchanged_metadata_is_not_rendered(monkeypatch, uploader):
+    record = next(read_records(RECORDS_PATH))
+    ledger = DeliveryLedger(":memory:")
+    assert main.get_metadata(record, uploader, direct=True, ledger=ledger) == (
+        main.METADATA_RENDERED
+    )
+
+    def parse_metadata_record(metadata):
+        raise AssertionError("unchanged record was parsed")
+
+    monkeypatch.setattr(main, "parse_metadata_record", parse_metadata_record)
+    assert main.get_metadata(record, uploader, direct=True, ledger=ledger) == (
+        main.METADATA_SKIPPED
+    )
+    record = dict(record, identifier=["not an isbn"])
+    assert main.get_metadata(record, uploader, direct=True, ledger=ledger) == (
+        main.METADATA_INVALID
+    )
+
+
+@pytest.mark.parametrize("direct", [False, True])
+def test_book_and_cover_without_isbn_are_not_delivered(
+    tmp_path, monkeypatch, file_server, uploader, direct
+):
+    monkeypatch.chdir(tmp_path)
+    for directory in ("books", "images", "metadata"):
+        os.mkdir(directory)
+    record = next(read_records(RECORDS_PATH))
+    record["identifier"][1] = file_server.url("/external_content.pdf")
+    record["identifier"][2] = "ISBN:9780199660798"  # invalid check digit
+    file_server.routes["/external_content.pdf"] = b"book"
+    viewer_id = record["identifier"][0].split("/")[-1]
+    file_server.routes[f"/ext/api/media/{viewer_id}/assets/thumbnail.jpg"] = b"cover"
+    ledger = DeliveryLedger(":memory:")
+
+    if direct:
+        for get_asset in (main.get_book, main.get_cover):
+            get_asset(
+                record,
+                uploader,
+                direct=True,
+                ledger=ledger,
+                assets_base_url=file_server.base_url,
+            )
+    else:
+        outcome = main.get_record_files(
+            record, uploader, ledger=ledger, assets_base_url=file_server.base_url
+        )
+        assert outcome == main.METADATA_INVALID
+
+    assert file_server.requests == []
+    assert "Contents" not in uploader.client.list_objects_v2(Bucket="test-bucket")
+    assert os.listdir("books") + os.listdir("images") == []
+
+
+def test_missing_isbn_is_counted_once_per_record(tmp_path, monkeypatch, uploader):
+    monkeypatch.chdir(tmp_path)
+    record = next(read_records(RECORDS_PATH))
+    record["identifier"] = [
+        identifier
+        for identifier in record["identifier"]
+        if not identifier.startswith("ISBN")
+    ]
+
+    outcome = main.get_record_files(record, uploader, ledger=DeliveryLedger(":memory:"))
+
+    assert outcome == main.METADATA_INVALID
+    assert get_warning_counts() == {"isbn": 1}
+
+
+def test_failed_upload_leaves_no_local_files(
+    tmp_path, monkeypatch, file_server, uploader
+):
+    monkeypatch.chdir(tmp_path)
+    for directory in ("books", "images", "metadata"):
+        os.mkdir(directory)
+    record = next(read_records(RECORDS_PATH))
+    record["identifier"][1] = file_server.url("/external_content.pdf")
+    file_server.routes["/external_content.pdf"] = b"book"
+    viewer_id = record["identifier"][0].split("/")[-1]
+    file_server.routes[f"/ext/api/media/{viewer_id}/assets/thumbnail.jpg"] = b"cover"
+    missing_bucket = main.S3Uploader(
+        bucket_name="missing-bucket", prefix="orl", client=uploader.client
+    )
+
+    with missing_bucket, pytest.raises(ValueError):
+        main.get_record_files(
+            record, missing_bucket, assets_base_url=file_server.base_url
+        )
+
+    assert len(file_server.requests) == 2
+    assert os.listdir("books") + os.listdir("images") + os.listdir("metadata") == []
+
+
+@pytest.mark.parametrize("direct", [False, True])
+def test_refresh_skips_not_modified_book(
+    tmp_path, monkeypatch, file_server, uploader, direct
+):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("books")
+    record = next(read_records(RECORDS_PATH))
+    record["identifier"][1] = file_server.url("/external_content.pdf")
+    versions = [b"book v1"]
+
+    def book(handler):
+        etag = f'"{len(versions)}"'
+        if handler.headers.get("If-None-Match") == etag:
+            return 304, b"", {"ETag": etag}
+        return 200, versions[-1], {"ETag": etag}
+
+    file_server.routes["/external_content.pdf"] = book
+    ledger = DeliveryLedger(":memory:")
+
+    main.get_book(record, uploader, direct=direct, ledger=ledger)
+    main.get_book(record, uploader, direct=direct, ledger=ledger)
+    assert len(file_server.requests) == 1
+    main.get_book(record, uploader, direct=direct, ledger=ledger, refresh=True)
+    assert file_server.requests[-1][1]["If-None-Match"] == '"1"'
+    assert ledger.get("9780199660797", BOOK)["s3_key"] == "orl/9780199660797.pdf"
+
+    versions.append(b"book v2")
+    main.get_book(record, uploader, direct=direct, ledger=ledger, refresh=True)
+    book_object = uploader.client.get_object(
+        Bucket="test-bucket", Key="orl/9780199660797.pdf"
+    )
+    assert book_object["Body"].read() == b"book v2"
+    assert (
+        ledger.get_validators(file_server.url("/external_content.pdf"))["etag"] == '"2"'
+    )
+    assert os.listdir("books") == []
@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+from src import main
+from src.catalogue import load_catalogue
+from src.licence_filter import LicenceFilter, normalise_rights
+from src.record_store import read_records
+
+RECORDS_PATH = os.path.join(os.path.dirname(__file__), "data", "oai_records.jsonl")
+
+
+@pytest.mark.parametrize(
+    "raw_rights, expected_rights",
+    [
+        (
+            "https://creativecommons.org/licenses/by/4.0/legalcode",
+            "creativecommons.org/licenses/by/4.0/legalcode",
+        ),
+        (
+            " HTTP://www.CreativeCommons.org/licenses/by/4.0/?lang=de",
+            "creativecommons.org/licenses/by/4.0",
+        ),
+        ("All rights reserved", "all rights reserved"),
+    ],
+)
+def test_normalise_rights(raw_rights, expected_rights):
+    assert normalise_rights(raw_rights) == expected_rights
+
+
+@pytest.mark.parametrize(
+    "record, expected_licensed",
+    [
+        ({"rights": ["https://creativecommons.org/licenses/by/4.0/legalcode"]}, True),
+        ({"rights": ["http://creativecommons.org/licenses/by/4.0/legalcode/"]}, True),
+        ({"rights": ["https://creativecommons.org/licenses/by/4.0/deed.de"]}, True),
+        ({"rights": ["https://creativecommons.org/licenses/by-nc/4.0/"]}, False),
+        ({"rights": ["https://creativecommons.org/licenses/by"]}, False),
+        ({"rights": ["All rights reserved"], "source": ["MODID-00000000488:KU"]}, True),
+        ({"rights": [None], "source": ["MODID-00000000001:Publisher"]}, False),
+        ({}, False),
+    ],
+)
+def test_licence_filter(record, expected_licensed):
+    licence_filter = LicenceFilter(
+        licence_urls=["https://creativecommons.org/licenses/by/4.0"],
+        source_ids=["MODID-00000000488"],
+    )
+    assert licence_filter.is_licensed(record) == expected_licensed
+
+
+@pytest.mark.parametrize(
+    "rights, expected_licensed",
+    [
+        ("https://creativecommons.org/licenses/by/4.0/legalcode", True),
+        ("https://creativecommons.org/licenses/by/4.0/", True),
+        ("https://creativecommons.org/licenses/by/4.0/deed.de", True),
+        ("http://www.creativecommons.org/licenses/by/4.0", True),
+        ("https://wiki.creativecommons.org/wiki/public_domain", True),
+        ("https://creativecommons.org/licenses/by-nc-nd/4.0/legalcode", False),
+        ("https://creativecommons.org/licenses/by/3.0/", False),
+    ],
+)
+def test_default_licence_filter_accepts_licence_variants(rights, expected_licensed):
+    assert LicenceFilter().is_licensed({"rights": [rights]}) == expected_licensed
+
+
+def test_licence_filter_catalogue_mask():
+    licence_filter = LicenceFilter()
+    catalogue = load_catalogue(RECORDS_PATH)
+
+    licensed = licence_filter.catalogue_mask(catalogue)
+
+    records = list(read_records(RECORDS_PATH))
+    assert catalogue.isbns(licensed) == [
+        main.parse_isbn(record["identifier"])
+        for record in licence_filter.filter(records)
+    ]
+    assert catalogue.count(licensed) == 3
+
+
+def test_harvest_stores_only_licensed_books(tmp_path, monkeypatch):
+    class Header:
+        def __init__(self, identifier):
+            self.identifier = identifier
+
+    class Record:
+        def __init__(self, metadata, number):
+            self.metadata = metadata
+            self.header = Header(f"oai:orl:{number}")
+
+    records = [
+        Record(record, number)
+        for number, record in enumerate(read_records(RECORDS_PATH))
+    ]
+    monkeypatch.setattr(main, "harvest_pages", lambda *args: iter([records]))
+    output_path = str(tmp_path / "records.jsonl")
+
+    main.parse_oai_archive_to_file(output_path=output_path)
+
+    assert [record["rights"] for record in read_records(output_path)] == [
+        record.metadata["rights"] for record in records[:2] + records[3:]
+    ]
+
+    os.remove(output_path)
+    main.parse_oai_archive_to_file(output_path=output_path, filter_licences=False)
+
+    assert len(list(read_records(output_path))) == len(records)
@@ -0,0 +1,97 @@
+import io
+import json
+import logging
+
+import pytest
+
+from src import main
+from src.downloader import download_to_file
+from src.log_config import configure_logging, stop_logging
+from src.metrics import Metrics, metrics
+
+
+@pytest.fixture
+def run_metrics():
+    return Metrics(logger=logging.getLogger("test.metrics"))
+
+
+def test_timer_records_histogram_and_errors(run_metrics):
+    with run_metrics.timer("parse"):
+        pass
+    with pytest.raises(ValueError):
+        with run_metrics.timer("parse"):
+            raise ValueError("broken record")
+
+    summary = run_metrics.summary()
+
+    assert summary["stages"]["parse"]["count"] == 2
+    assert summary["counters"] == {'orl_pipeline_errors_total{stage="parse"}': 1}
+
+
+def test_to_prometheus(run_metrics):
+    run_metrics.observe("download", 0.2)
+    run_metrics.observe("download", 7)
+    run_metrics.inc("bytes_total", 100, direction="download")
+    run_metrics.set_gauge("records_per_second", 2.5)
+
+    lines = run_metrics.to_prometheus().splitlines()
+
+    assert "# TYPE orl_pipeline_bytes_total counter" in lines
+    assert 'orl_pipeline_bytes_total{direction="download"} 100' in lines
+    assert "orl_pipeline_records_per_second 2.5" in lines
+    assert "# TYPE orl_pipeline_stage_duration_seconds histogram" in lines
+    assert (
+        'orl_pipeline_stage_duration_seconds_bucket{stage="download",le="0.1"} 0'
+        in lines
+    )
+    assert (
+        'orl_pipeline_stage_duration_seconds_bucket{stage="download",le="0.5"} 1'
+        in lines
+    )
+    assert (
+        'orl_pipeline_stage_duration_seconds_bucket{stage="download",le="+Inf"} 2'
+        in lines
+    )
+    assert 'orl_pipeline_stage_duration_seconds_count{stage="download"} 2' in lines
+
+
+def test_summary_is_logged_as_json():
+    stream = io.StringIO()
+    stop_logging()
+    configure_logging(stream=stream)
+    run_metrics = Metrics()
+    run_metrics.observe("upload", 0.5)
+
+    run_metrics.log_summary()
+    stop_logging()
+
+    record = json.loads(stream.getvalue())
+    assert record["message"] == "run summary"
+    assert record["stages"]["upload"]["count"] == 1
+
+
+def test_download_is_measured(tmp_path, file_server):
+    metrics.reset()
+    file_server.routes["/book.pdf"] = b"book"
+
+    download_to_file(file_server.url("/book.pdf"), str(tmp_path / "book.pdf"))
+
+    assert metrics.summary()["stages"]["download"]["count"] == 1
+    assert metrics.counters[("bytes_total", (("direction", "download"),))] == 4
+
+
+def test_process_books_from_file_writes_metrics_of_its_own_run(tmp_path, uploader):
+    records_path = tmp_path / "records.jsonl"
+    records_path.write_text("")
+    metrics_path = str(tmp_path / "metrics.prom")
+    metrics.observe("download", 0.5)
+
+    main.process_books_from_file(
+        records_path=str(records_path),
+        uploader=uploader,
+        ledger_path=None,
+        metrics_path=metrics_path,
+    )
+
+    with open(metrics_path) as metrics_file:
+        assert 'stage="download"' not in metrics_file.read()
@@ -0,0 +1,89 @@
+import os
+import threading
+import xml.etree.ElementTree as ElementTree
+
+from src.main import parse_metadata_record, render_metadata_from_file
+from src.onix_batch import OnixBatchWriter
+from src.record_store import read_records
+from src.renderer import OnixRenderer
+
+RECORDS_PATH = os.path.join(os.path.dirname(__file__), "data", "oai_records.jsonl")
+
+
+def test_onix_batch_writer_splits_by_products(tmp_path):
+    books = [parse_metadata_record(record) for record in read_records(RECORDS_PATH)]
+    completed = []
+    renderer = OnixRenderer(use_bytecode_cache=False)
+    with OnixBatchWriter(
+        directory=str(tmp_path),
+        max_products=3,
+        on_batch_complete=completed.append,
+        renderer=renderer,
+    ) as writer:
+        for book in books:
+            writer.add(book)
+
+    assert len(completed) == 2
+    isbns = []
+    for path in completed:
+        message = ElementTree.parse(path).getroot()
+        assert len(message.findall("Header")) == 1
+        isbns += [value.text for value in message.iter("IDValue")]
+    assert isbns == [book["isbn13"] for book in books]
+
+    with open(completed[0]) as batch:
+        assert renderer.render_product(books[0]) in batch.read()
+
+
+def test_onix_batch_writer_splits_by_bytes(tmp_path):
+    books = [parse_metadata_record(record) for record in read_records(RECORDS_PATH)]
+    with OnixBatchWriter(directory=str(tmp_path), max_bytes=1) as writer:
+        for book in books:
+            writer.add(book)
+    assert len(writer.completed_files) == len(books)
+
+
+def test_onix_batch_writer_adds_while_batch_is_uploaded(tmp_path):
+    books = [parse_metadata_record(record) for record in read_records(RECORDS_PATH)]
+    uploading = threading.Event()
+    release = threading.Event()
+    uploaded = threading.Event()
+
+    def upload(path):
+        if not uploading.is_set():
+            uploading.set()
+            release.wait(1)
+            uploaded.set()
+
+    writer = OnixBatchWriter(
+        directory=str(tmp_path), max_products=1, on_batch_complete=upload
+    )
+    uploader = threading.Thread(target=writer.add, args=(books[0],))
+    uploader.start()
+    assert uploading.wait(5)
+
+    writer.add_rendered("<Product/>")
+    assert not uploaded.is_set()
+    release.set()
+    uploader.join()
+    writer.close()
+
+    assert len(writer.completed_files) == 2
+
+
+def test_render_metadata_from_file_in_processes(tmp_path):
+    records = list(read_records(RECORDS_PATH))
+    renderer = OnixRenderer(use_bytecode_cache=False)
+    expected = [
+        renderer.render_product(parse_metadata_record(record)) for record in records
+    ]
+
+    paths = render_metadata_from_file(
+        RECORDS_PATH, workers=2, chunk_size=1, directory=str(tmp_path)
+    )
+
+    assert len(paths) == 1
+    with open(paths[0]) as batch:
+        content = batch.read()
+    positions = [content.index(product) for product in expected]
+    assert positions == sorted(positions)
@@ -0,0 +1,245 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import pytest
+
+from src import main
+from src.fields_parser import parse_title
+from src.log_config import (
+    configure_logging,
+    configure_worker_logging,
+    get_worker_queue,
+    stop_logging,
+)
+from src.pipeline import iter_chunks, map_in_processes, run_concurrently, run_stages
+from src.utils import HostLimiter
+
+
+def test_run_concurrently_downloads_with_host_limit(tmp_path, monkeypatch, file_server):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("books")
+    file_server.delay = 0.05
+    records = []
+    for number in range(20):
+        file_server.routes[f"/{number}.pdf"] = f"book {number}".encode()
+        records.append(
+            dict(url=file_server.url(f"/{number}.pdf"), isbn=number, book_format="PDF")
+        )
+    host = urlparse(file_server.base_url).netloc
+    monkeypatch.setattr(main, "host_limiter", HostLimiter({host: 3}))
+
+    stats = run_concurrently(records, main.download_book, workers=10)
+
+    assert stats.processed == 20
+    assert stats.failed == 0
+    assert stats.books_per_second > 0
+    assert file_server.max_active == 3
+    with open("books/7.pdf", "rb") as book:
+        assert book.read() == b"book 7"
+
+
+def test_run_concurrently_counts_failures():
+    pulled = []
+
+    def records():
+        for number in range(10):
+            pulled.append(number)
+            yield {"identifier": [number]}
+
+    def handler(record):
+        if record["identifier"][0] % 2:
+            raise ValueError("broken record")
+
+    stats = run_concurrently(records(), handler, workers=2, max_in_flight=2)
+
+    assert pulled == list(range(10))
+    assert (stats.processed, stats.failed) == (5, 5)
+
+
+def test_run_concurrently_logs_failures_and_report():
+    stream = io.StringIO()
+    configure_logging(stream=stream)
+
+    def handler(record):
+        raise ValueError("broken record")
+
+    run_concurrently([{"identifier": [1]}], handler, workers=1)
+
+    stop_logging()
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(record["name"], record["levelname"]) for record in records] == [
+        ("orl.pipeline", "WARNING"),
+        ("orl.pipeline", "INFO"),
+    ]
+    assert records[0]["message"] == "failed to process record [1]: broken record"
+    assert records[1]["message"].startswith("Processed 0 books")
+
+
+def test_run_concurrently_counts_outcomes():
+    def handler(record):
+        return "skipped" if record["identifier"][0] < 3 else "rendered"
+
+    stats = run_concurrently(({"identifier": [n]} for n in range(5)), handler)
+
+    assert stats.counters == {"skipped": 3, "rendered": 2}
+    assert stats.report().endswith(", rendered: 2, skipped: 3")
+
+
+def test_map_in_processes_keeps_order():
+    chunks = list(iter_chunks(range(10), 3))
+    assert chunks == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]
+
+    results = map_in_processes(sorted, ([9 - n, n] for n in range(20)), workers=2)
+
+    assert list(results) == [sorted([9 - n, n]) for n in range(20)]
+
+
+def test_map_in_processes_forwards_worker_logs():
+    stream = io.StringIO()
+    configure_logging(stream=stream)
+
+    results = map_in_processes(
+        parse_title,
+        [None, ["Title"]],
+        workers=1,
+        initializer=configure_worker_logging,
+        initargs=(get_worker_queue(), logging.INFO),
+    )
+
+    assert list(results) == ["", "Title"]
+    stop_logging()
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(record["name"], record["message"]) for record in records] == [
+        ("orl.fields_parser", "wrong title: None")
+    ]
+
+
+def test_run_stages_delivers_while_pages_are_harvested():
+    events = []
+
+    def pages():
+        for number in range(4):
+            events.append(("page", number))
+            yield [{"identifier": [number * 10 + n]} for n in range(5)]
+
+    def render(record):
+        return "rendered", [{"name": f"{record['identifier'][0]}.xml"}]
+
+    def download(record):
+        return [{"name": f"{record['identifier'][0]}.pdf"}]
+
+    def upload(delivery):
+        events.append(("upload", delivery["name"]))
+
+    stats = asyncio.run(
+        run_stages(pages(), render, download, upload, 1, 1, 1, queue_size=2)
+    )
+
+    assert (stats.processed, stats.failed) == (20, 0)
+    assert stats.counters == {"rendered": 20}
+    assert len([event for event in events if event[0] == "upload"]) == 40
+    assert events.index(("upload", "0.xml")) < events.index(("page", 3))
+
+
+def test_run_stages_counts_failures_once_per_record():
+    def render(record):
+        if record["identifier"][0] == 1:
+            raise ValueError("broken metadata")
+        return "rendered", []
+
+    def download(record):
+        return [
+            {"identifier": record["identifier"]},
+            {"identifier": record["identifier"]},
+        ]
+
+    def upload(delivery):
+        if delivery["identifier"][0] == 2:
+            raise ValueError("upload failed")
+
+    stream = io.StringIO()
+    configure_logging(stream=stream)
+    records = [{"identifier": [n]} for n in range(5)]
+    stats = asyncio.run(run_stages([records], render, download, upload))
+
+    assert (stats.processed, stats.failed) == (3, 2)
+    assert stats.counters == {"rendered": 3}
+    stop_logging()
+    logged = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert sorted(
+        record["message"] for record in logged if record["levelname"] == "WARNING"
+    ) == [
+        "failed to process record [1]: broken metadata",
+        "failed to process record [2]: upload failed",
+        "failed to process record [2]: upload failed",
+    ]
+
+
+def test_run_stages_waits_for_threads_without_blocking_event_loop():
+    uploading = threading.Event()
+
+    def pages():
+        yield [{"identifier": [1]}]
+        uploading.wait(1)
+        raise RuntimeError("harvest failed")
+
+    def render(record):
+        return "rendered", [{"name": "1.xml"}]
+
+    def upload(delivery):
+        uploading.set()
+        time.sleep(0.3)
+
+    async def run():
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.ensure_future(tick())
+        with pytest.raises(RuntimeError):
+            await run_stages(pages(), render, lambda record: [], upload)
+        ticker.cancel()
+        return ticks
+
+    assert len(asyncio.run(run())) > 10
+
+
+def test_harvest_and_process_books_asks_for_rerun_after_failed_run(
+    tmp_path, monkeypatch
+):
+    stream = io.StringIO()
+    configure_logging(stream=stream)
+
+    def harvest_books(*args):
+        yield [{"identifier": [1]}]
+        raise RuntimeError("harvest failed")
+
+    monkeypatch.setattr(main, "harvest_books", harvest_books)
+    monkeypatch.setattr(
+        main, "download_metadata_delivery", lambda record, ledger: {"outcome": None}
+    )
+    monkeypatch.setattr(main, "download_asset_delivery", lambda *args: {})
+
+    with pytest.raises(RuntimeError):
+        main.harvest_and_process_books(
+            records_path=str(tmp_path / "records.jsonl"),
+            uploader=object(),
+            ledger_path=None,
+            metrics_path=None,
+        )
+
+    stop_logging()
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(record["name"], record["levelname"]) for record in records] == [
+        ("orl.main", "WARNING")
+    ]
+    assert "process_books_from_file" in records[0]["message"]
@@ -0,0 +1,58 @@
+import pytest
+
+from src.record_store import (
+    RecordWriter,
+    compact_records,
+    convert_legacy_dump,
+    read_records,
+)
+
+RECORDS = [
+    {
+        "identifier": [
+            "ISBN:9780199660797",
+            "https://openresearchlibrary.org/viewer/9fa24158",
+        ],
+        "title": ["Über Bücher: \"quotes\" and 'apostrophes'"],
+        "type": ["BOOK"],
+    },
+    {"title": ["Second"], "type": ["BOOK"], "creator": ["Potter, Harry"]},
+]
+
+
+@pytest.mark.parametrize("file_name", ["records.jsonl", "records.jsonl.gz"])
+def test_record_store_round_trip(tmp_path, file_name):
+    path = str(tmp_path / file_name)
+    with RecordWriter(path) as writer:
+        writer.write(RECORDS[0])
+        writer.flush()
+    with RecordWriter(path) as writer:
+        writer.write_many(RECORDS[1:])
+    assert list(read_records(path)) == RECORDS
+
+
+def test_convert_legacy_dump(tmp_path):
+    legacy_path = tmp_path / "output_right.csv"
+    legacy_path.write_text("".join(f"{record}\n" for record in RECORDS))
+    store_path = str(tmp_path / "output_right.jsonl")
+
+    assert convert_legacy_dump(str(legacy_path), store_path) == len(RECORDS)
+    assert list(read_records(store_path)) == RECORDS
+
+
+@pytest.mark.parametrize("file_name", ["records.jsonl", "records.jsonl.gz"])
+def test_compact_records_keeps_last_version(tmp_path, file_name):
+    path = str(tmp_path / file_name)
+    records = [
+        {"oai_identifier": "oai:orl:1", "title": ["First"]},
+        {"oai_identifier": "oai:orl:2", "title": ["Second"]},
+        {"title": ["Legacy"]},
+        {"oai_identifier": "oai:orl:1", "title": ["First, revised"]},
+        {"title": ["Legacy"]},
+    ]
+    with RecordWriter(path) as writer:
+        writer.write_many(records)
+
+    assert compact_records(path) == 1
+    assert list(read_records(path)) == records[1:]
+    assert compact_records(path) == 0
@@ -0,0 +1,57 @@
+import os
+from datetime import datetime
+
+import jinja2
+
+from src import utils
+from src.contants import BOOK_TEMPLATE
+from src.main import parse_metadata_record
+from src.record_store import read_records
+from src.renderer import OnixRenderer
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+BOOK = dict(
+    BOOK_TEMPLATE,
+    isbn13="9780199660797",
+    bisacs=["HIS027100"],
+    format="PDF",
+    contributors="Harry Potter",
+    record_reference="9780199660797.pdf",
+)
+
+
+def test_renderer_does_not_touch_filesystem_after_init(tmp_path, monkeypatch):
+    renderer = OnixRenderer(bytecode_cache_dir=str(tmp_path))
+    first = renderer.render(BOOK)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("template was loaded again")
+
+    monkeypatch.setattr(jinja2.FileSystemLoader, "get_source", fail)
+    assert renderer.render(BOOK) == first
+    assert "<IDValue>9780199660797</IDValue>" in first
+
+
+def test_renderer_bytecode_cache(tmp_path):
+    OnixRenderer(bytecode_cache_dir=str(tmp_path))
+    assert list(tmp_path.iterdir())
+    # second process start loads compiled template from cache
+    assert OnixRenderer(bytecode_cache_dir=str(tmp_path)).render(BOOK)
+
+
+def test_renderer_matches_golden_files(monkeypatch):
+    class FixedDatetime(datetime):
+        @classmethod
+        def today(cls):
+            return cls(2021, 1, 1)
+
+    monkeypatch.setattr(utils, "datetime", FixedDatetime)
+    renderer = OnixRenderer(use_bytecode_cache=False)
+    records = list(read_records(os.path.join(DATA_DIR, "oai_records.jsonl")))
+    assert records
+    for record in records:
+        book = parse_metadata_record(record)
+        golden_path = os.path.join(DATA_DIR, "golden", f"{book['isbn13']}.xml")
+        with open(golden_path) as golden:
+            assert renderer.render(book) == golden.read()
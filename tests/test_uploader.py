@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from src.uploader import S3Uploader
+
+
+def test_upload_many_uploads_and_deletes_local_files(uploader, tmp_path):
+    paths = []
+    for number in range(20):
+        path = tmp_path / f"{number}.xml"
+        path.write_text(f"<Product>{number}</Product>")
+        paths.append(str(path))
+
+    keys = uploader.upload_many(paths, delete_local=True)
+
+    assert keys == [f"orl/{number}.xml" for number in range(20)]
+    body = uploader.client.get_object(Bucket="test-bucket", Key="orl/7.xml")["Body"]
+    assert body.read() == b"<Product>7</Product>"
+    assert os.listdir(tmp_path) == []
+
+
+def test_upload_many_reports_failures(uploader, tmp_path):
+    path = tmp_path / "cover.jpg"
+    path.write_bytes(b"cover")
+
+    with pytest.raises(ValueError, match="Failed to upload 1 of 2 files"):
+        uploader.upload_many([str(path), str(tmp_path / "missing.jpg")])
+    assert uploader.client.get_object(Bucket="test-bucket", Key="orl/cover.jpg")
+
+
+def test_uploader_context_closes_upload_threads(uploader, tmp_path):
+    path = tmp_path / "cover.jpg"
+    path.write_bytes(b"cover")
+
+    with uploader:
+        assert uploader.upload_many([str(path)]) == ["orl/cover.jpg"]
+
+    with pytest.raises(RuntimeError):
+        uploader.upload_many([str(path)])
+
+
+@pytest.mark.parametrize(
+    "prefix, expected_key",
+    [("/content/orl/", "content/orl/book.pdf"), ("", "book.pdf")],
+)
+def test_get_key_normalises_prefix(prefix, expected_key):
+    with S3Uploader(
+        bucket_name="test-bucket", prefix=prefix, client=object()
+    ) as uploader:
+        assert uploader.get_key("book.pdf") == expected_key
@@ -1,6 +1,16 @@
 import pytest
 
-from src.utils import generate_product_reference, get_contributors_dict
+from src import utils
+from src.utils import (
+    ConnectionPool,
+    execute_bulk_update,
+    select_in_chunks,
+    flatten_parameters,
+    generate_product_reference,
+    get_contributors_dict,
+    get_field,
+    get_parameter,
+)
 
 
 @pytest.mark.parametrize(
@@ -29,3 +39,122 @@ def test_get_contributors_dict():
         contributor_role="A01", person_name=contributors, sequence_number="1"
     )
     assert get_contributors_dict(contributors) == expected_dict
+
+
+@pytest.mark.parametrize("key", ["a", "b", "c", "d", "e", "f", "missing"])
+def test_flatten_parameters_matches_get_parameter(key):
+    parameter = {
+        "a": "",
+        "b": {"c": "", "d": {"c": "deep", "e": None}},
+        "f": {"c": "second", "d": "shadowed", "e": "value"},
+    }
+    fields = flatten_parameters(parameter)
+    assert get_field(fields, key, "default") == get_parameter(parameter, key, "default")
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+        self.rows = []
+
+    def execute(self, statement, params=None):
+        self.connection.statements.append((statement, params))
+        if statement.startswith("SELECT"):
+            self.rows = [{"id": row_id} for row_id in params]
+        else:
+            self.rowcount = len(params) // 3
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeConnection:
+    """In-memory stand-in for pymysql connection"""
+
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self, *args):
+        return FakeCursor(self)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+@pytest.fixture
+def fake_connections(monkeypatch):
+    connections = []
+
+    def connect(connection_details):
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    monkeypatch.setattr(utils, "initialise_connection", connect)
+    return connections
+
+
+def test_connection_pool_reuses_connections(fake_connections):
+    pool = ConnectionPool({}, size=2)
+    for _ in range(5):
+        with pool.connection():
+            pass
+    assert len(fake_connections) == 1
+
+
+def test_execute_bulk_update_chunks_in_one_transaction(fake_connections):
+    pool = ConnectionPool({})
+    values = {row_id: row_id % 3 for row_id in range(1, 6)}
+
+    assert execute_bulk_update("meta_data", "language_id", "id", values, pool, 2) == 5
+
+    connection = fake_connections[0]
+    assert connection.commits == 1
+    assert [params for _, params in connection.statements] == [
+        [1, 1, 2, 2, 1, 2],
+        [3, 0, 4, 1, 3, 4],
+        [5, 2, 5],
+    ]
+    assert connection.statements[-1][0] == (
+        "UPDATE meta_data SET language_id = CASE id WHEN %s THEN %s END "
+        "WHERE id IN (%s)"
+    )
+
+
+def test_execute_bulk_update_rejects_wrong_identifiers(fake_connections):
+    with pytest.raises(ValueError):
+        execute_bulk_update("meta_data; DROP", "language_id", "id", {1: 1}, None)
+
+
+def test_select_in_chunks_streams_rows(fake_connections):
+    query = "SELECT id FROM meta_data WHERE id IN ({ids})"
+    rows = select_in_chunks(query, iter(range(5)), {}, chunk_size=2)
+
+    assert list(rows) == [{"id": row_id} for row_id in range(5)]
+    assert fake_connections[0].statements == [
+        ("SELECT id FROM meta_data WHERE id IN (%s, %s)", [0, 1]),
+        ("SELECT id FROM meta_data WHERE id IN (%s, %s)", [2, 3]),
+        ("SELECT id FROM meta_data WHERE id IN (%s)", [4]),
+    ]